@@ -18,6 +18,11 @@ def _init_db(config):
         # Use configured SQLITE_FILE path (absolute or relative to working directory)
         db_path = config.get('SQLITE_FILE', 'backupmate.db')
     conn = sqlite3.connect(db_path)
+    _init_schema(conn)
+    return conn
+
+def _init_schema(conn):
+    """Create the backup metadata schema on an open connection."""
     cursor = conn.cursor()
     
     # Create table if it doesn't exist
@@ -32,7 +37,6 @@ def _init_db(config):
     )
     ''')
     conn.commit()
-    return conn
 
 def _clean_backup_chain(config):
     """Clean up the existing backup chain directory."""
@@ -57,6 +61,45 @@ def get_latest_local_backup(config):
         if conn:
             conn.close()
 
+def _compress_and_upload(temp_dir, compressed_file, s3_prefix, config):
+    """
+    Compresses a backup directory and uploads the archive under s3_prefix.
+
+    With STREAM_UPLOAD set the compressed stream goes straight into a multipart
+    upload, so the archive is never written to or read back from local disk.
+
+    Args:
+        temp_dir (str): Backup directory to compress
+        compressed_file (str): Local archive path, its name is used as the object name
+        s3_prefix (str): S3 prefix to upload the archive under
+        config (dict): Configuration parameters
+
+    Returns:
+        bool: True on success, False on failure
+    """
+    s3_bucket = config.get('S3_BUCKET_NAME')
+    if config.get('STREAM_UPLOAD'):
+        archive_name = os.path.basename(compressed_file)
+        if not utils.compress_directory_to_stream(
+            temp_dir,
+            archive_name,
+            lambda stream: s3.upload_stream(stream, s3_bucket, s3_prefix + archive_name, config)
+        ):
+            logger.error("Streaming backup upload failed")
+            return False
+        return True
+
+    # Compress the backup for S3
+    if not utils.compress_directory(temp_dir, compressed_file):
+        logger.error("Backup compression failed")
+        return False
+
+    # Upload to S3
+    if not s3.upload_file(compressed_file, s3_bucket, s3_prefix, config):
+        logger.error("S3 upload failed")
+        return False
+    return True
+
 def perform_full_backup(config):
     """
     Orchestrates the full backup process.
@@ -72,7 +115,7 @@ def perform_full_backup(config):
     chain_dir = os.path.join(config.get('LOCAL_TEMP_DIR'), 'chain')
     backup_dir = os.path.join(chain_dir, f'full_{timestamp}')
     s3_prefix = f"{config.get('FULL_BACKUP_PREFIX')}"
-    compressed_file = f"{temp_dir}.tar.gz"
+    compressed_file = f"{temp_dir}{utils.ARCHIVE_SUFFIXES[config.get('ARCHIVE_FORMAT') or 'gz']}"
     
     try:
         # Clean up existing backup chain for new full backup
@@ -97,19 +140,8 @@ def perform_full_backup(config):
         # Copy prepared backup to chain directory
         shutil.copytree(temp_dir, backup_dir, dirs_exist_ok=True)
         
-        # Compress the backup for S3
-        if not utils.compress_directory(temp_dir, compressed_file):
-            logger.error("Backup compression failed")
-            return False
-            
-        # Upload to S3
-        if not s3.upload_file(
-            compressed_file,
-            config.get('S3_BUCKET_NAME'),
-            s3_prefix,
-            config
-        ):
-            logger.error("S3 upload failed")
+        # Compress the backup and upload it to S3
+        if not _compress_and_upload(temp_dir, compressed_file, s3_prefix, config):
             return False
             
         # Record successful backup with local path
@@ -159,7 +191,7 @@ def perform_incremental_backup(config, base_prefix):
     chain_dir = os.path.join(config.get('LOCAL_TEMP_DIR'), 'chain')
     backup_dir = os.path.join(chain_dir, f'inc_{timestamp}')
     s3_prefix = f"{config.get('INCREMENTAL_BACKUP_PREFIX')}"
-    compressed_file = f"{temp_dir}.tar.gz"
+    compressed_file = f"{temp_dir}{utils.ARCHIVE_SUFFIXES[config.get('ARCHIVE_FORMAT') or 'gz']}"
     
     success = False
     try:
@@ -181,19 +213,8 @@ def perform_incremental_backup(config, base_prefix):
         # Copy prepared backup to chain directory
         shutil.copytree(temp_dir, backup_dir, dirs_exist_ok=True)
         
-        # Compress the backup for S3
-        if not utils.compress_directory(temp_dir, compressed_file):
-            logger.error("Backup compression failed")
-            return False
-            
-        # Upload to S3
-        if not s3.upload_file(
-            compressed_file,
-            config.get('S3_BUCKET_NAME'),
-            s3_prefix,
-            config
-        ):
-            logger.error("S3 upload failed")
+        # Compress the backup and upload it to S3
+        if not _compress_and_upload(temp_dir, compressed_file, s3_prefix, config):
             return False
             
         # Record successful backup with local path
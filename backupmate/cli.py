@@ -2,6 +2,8 @@ import argparse
 import json
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 from typing import Optional, Dict, Any
 from pathlib import Path
 
@@ -61,22 +63,15 @@ def handle_restore(args: argparse.Namespace, config: Dict[str, Any], logger: Any
         log_info(logger, "Starting restore operation")
         # Determine backup identifier based on flags
         backup_identifier = args.backup_id
-        if args.latest_full:
-            # TODO: Get latest full backup identifier from S3
-            backups = s3.list_objects(
+        if args.latest_full or args.latest_incremental:
+            # Pick the newest backup using LastModified from the LIST response
+            prefix = config['FULL_BACKUP_PREFIX'] if args.latest_full else config['INCREMENTAL_BACKUP_PREFIX']
+            backups = s3.list_object_summaries(
                 config['S3_BUCKET_NAME'],
-                config['FULL_BACKUP_PREFIX'],
-                config
-            )
-            backup_identifier = backups[-1] if backups else None
-        elif args.latest_incremental:
-            # TODO: Get latest incremental backup identifier from S3
-            backups = s3.list_objects(
-                config['S3_BUCKET_NAME'],
-                config['INCREMENTAL_BACKUP_PREFIX'],
+                prefix,
                 config
             )
-            backup_identifier = backups[-1] if backups else None
+            backup_identifier = max(backups, key=itemgetter('LastModified', 'Key'))['Key'] if backups else None
 
         if not backup_identifier:
             log_error(logger, "No backup found to restore")
@@ -102,28 +97,27 @@ def handle_list(args: argparse.Namespace, config: Dict[str, Any], logger: Any) -
     try:
         log_info(logger, "Listing available backups")
         
-        # List full backups
-        full_backups = s3.list_objects(
-            config['S3_BUCKET_NAME'],
-            config['FULL_BACKUP_PREFIX'],
-            config
-        )
-        
-        # List incremental backups
-        incremental_backups = s3.list_objects(
-            config['S3_BUCKET_NAME'],
-            config['INCREMENTAL_BACKUP_PREFIX'],
-            config
-        )
-        
-        # Transform into a list of backups with type field
-        output = []
-        for backup in full_backups:
-            output.append({'id': backup, 'type': 'full'})
-        for backup in incremental_backups:
-            output.append({'id': backup, 'type': 'incremental'})
+        # List full and incremental backups concurrently
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            full_future = executor.submit(
+                s3.list_objects,
+                config['S3_BUCKET_NAME'],
+                config['FULL_BACKUP_PREFIX'],
+                config
+            )
+            incremental_future = executor.submit(
+                s3.list_objects,
+                config['S3_BUCKET_NAME'],
+                config['INCREMENTAL_BACKUP_PREFIX'],
+                config
+            )
+            full_backups = full_future.result()
+            incremental_backups = incremental_future.result()
         
         if args.json:
+            # Transform into a list of backups with type field
+            output = [{'id': backup, 'type': 'full'} for backup in full_backups]
+            output.extend({'id': backup, 'type': 'incremental'} for backup in incremental_backups)
             print(json.dumps(output, indent=2))
         else:
             print("\nFull Backups:")
@@ -138,8 +132,8 @@ def handle_list(args: argparse.Namespace, config: Dict[str, Any], logger: Any) -
         log_error(logger, f"Error listing backups: {str(e)}")
         return False
 
-def main() -> Optional[int]:
-    """Main entry point for the BackupMate CLI."""
+def _build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser for the BackupMate CLI."""
     parser = argparse.ArgumentParser(description="Backup and restore your MariaDB database.")
     subparsers = parser.add_subparsers(dest="command", help="Available commands")
 
@@ -160,8 +154,21 @@ def main() -> Optional[int]:
     list_parser = subparsers.add_parser("list", help="List available backups")
     list_parser.add_argument("--json", action="store_true", help="Output in JSON format")
 
+    return parser
+
+# Built once at import and reused by every main() call
+_PARSER = _build_parser()
+
+def main() -> Optional[int]:
+    """Main entry point for the BackupMate CLI."""
+    parser = _PARSER
     args = parser.parse_args()
 
+    # Without a command there is nothing to run, so skip config and logger setup
+    if args.command is None:
+        parser.print_help()
+        return 0
+
     try:
         # Check if running as root/sudo for backup and restore commands
         if args.command in ["backup", "restore"]:
@@ -1,8 +1,40 @@
 import os
 from dotenv import load_dotenv
 
-def load_config(env_path=".backupmate.env"):
-    """Loads configuration parameters from the .env file."""
+# Parameters that must be present and non-blank, in the order they are reported.
+# DB_PASSWORD is expected in the file but may be empty.
+_REQUIRED_PARAMS = (
+    "DB_HOST",
+    "DB_PORT",
+    "DB_USER",
+    "MARIADB_BACKUP_PATH",
+    "S3_BUCKET_NAME",
+    "AWS_ACCESS_KEY_ID",
+    "AWS_SECRET_ACCESS_KEY",
+    "AWS_REGION",
+    "LOCAL_TEMP_DIR",
+    "FULL_BACKUP_PREFIX",
+    "INCREMENTAL_BACKUP_PREFIX",
+    "FULL_BACKUP_SCHEDULE",
+)
+
+_BACKUP_SCHEDULES = frozenset(("weekly", "monthly"))
+
+_ARCHIVE_FORMATS = frozenset(("gz", "zst"))
+
+def load_config(env_path=".backupmate.env", *, stream=None):
+    """
+    Loads configuration parameters from the .env file.
+
+    If a text stream is given it is parsed instead of env_path, bypassing the
+    filesystem.
+    """
+    if stream is not None:
+        config = _parse_config(stream=stream)
+        if 'integration_overrides' in globals():
+            config.update(integration_overrides)
+        return config
+
     # Only load if file exists, otherwise return empty config
     if not os.path.exists(env_path):
         return {key: None for key in [
@@ -16,9 +48,16 @@ def load_config(env_path=".backupmate.env"):
         ]}
     #assert 'integration_overrides' in globals()
 
-    # Load with override to ensure we get values from the specified file
-    load_dotenv(dotenv_path=env_path, override=True)
-    config = {
+    config = _parse_config(env_path=env_path)
+    if 'integration_overrides' in globals():
+        config.update(integration_overrides)
+    return config
+
+def _parse_config(env_path=None, stream=None):
+    """Parses the .env file or stream and returns the configuration dict."""
+    # Load with override to ensure we get values from the specified source
+    load_dotenv(dotenv_path=env_path, stream=stream, override=True)
+    return {
         "DB_HOST": os.getenv("DB_HOST"),
         "DB_PORT": os.getenv("DB_PORT"),
         "DB_USER": os.getenv("DB_USER"),
@@ -39,30 +78,18 @@ def load_config(env_path=".backupmate.env"):
         "MYSQL_START_COMMAND": os.getenv("MYSQL_START_COMMAND"),  # Optional command to start MySQL server
         "MYSQL_STOP_COMMAND": os.getenv("MYSQL_STOP_COMMAND"),  # Optional command to stop MySQL server
         "SQLITE_FILE": os.getenv("SQLITE_FILE", "backupmate.db"),  # SQLite database file path, defaults to backupmate.db
+        "S3_MAX_CONCURRENCY": os.getenv("S3_MAX_CONCURRENCY"),  # Optional parallel part requests per S3 transfer
+        "S3_PREFIX_PARALLELISM": os.getenv("S3_PREFIX_PARALLELISM"),  # Optional objects transferred at once per directory
+        "STREAM_EXTRACT": os.getenv("STREAM_EXTRACT", "false").lower() == "true",  # Extract restores straight from S3
+        "STREAM_UPLOAD": os.getenv("STREAM_UPLOAD", "false").lower() == "true",  # Compress backups straight into S3
+        "ARCHIVE_FORMAT": os.getenv("ARCHIVE_FORMAT"),  # Optional archive codec for new backups, 'gz' (default) or 'zst'
     }
-    if 'integration_overrides' in globals():
-        config.update(integration_overrides)
-    return config
 
 def validate_config(config):
     """Validates the loaded configuration to ensure all required parameters are present."""
-    required_params = [
-        "DB_HOST",
-        "DB_PORT",
-        "DB_USER",
-        "DB_PASSWORD",
-        "MARIADB_BACKUP_PATH",
-        "S3_BUCKET_NAME",
-        "AWS_ACCESS_KEY_ID",
-        "AWS_SECRET_ACCESS_KEY",
-        "AWS_REGION",
-        "LOCAL_TEMP_DIR",
-        "FULL_BACKUP_PREFIX",
-        "INCREMENTAL_BACKUP_PREFIX",
-        "FULL_BACKUP_SCHEDULE",
-    ]
-    for param in required_params:
-        if param != 'DB_PASSWORD' and (not config.get(param) or config[param].strip() == ""):
+    for param in _REQUIRED_PARAMS:
+        value = config.get(param)
+        if not value or value.strip() == "":
             raise ValueError(f"Missing required configuration parameter: {param}")
 
     # Validate DB_PORT is an integer
@@ -73,9 +100,13 @@ def validate_config(config):
             raise ValueError("DB_PORT must be an integer")
 
     # Validate schedule format
-    if config["FULL_BACKUP_SCHEDULE"] not in ["weekly", "monthly"]:
+    if config["FULL_BACKUP_SCHEDULE"] not in _BACKUP_SCHEDULES:
         raise ValueError("FULL_BACKUP_SCHEDULE must be either 'weekly' or 'monthly'")
 
+    # Validate archive format if provided
+    if config.get("ARCHIVE_FORMAT") and config["ARCHIVE_FORMAT"] not in _ARCHIVE_FORMATS:
+        raise ValueError("ARCHIVE_FORMAT must be either 'gz' or 'zst'")
+
     # Validate S3 prefix paths end with '/'
     if not config["FULL_BACKUP_PREFIX"].endswith("/"):
         raise ValueError("S3 prefix paths must end with '/'")
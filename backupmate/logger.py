@@ -1,37 +1,163 @@
+import copy
 import json
 import logging
-from datetime import datetime
-from typing import Any, Dict, Optional
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable, Dict, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # Optional speedup, fall back to the stdlib encoder
+    orjson = None
+
+def _dumps(obj: Dict[str, Any]) -> str:
+    """Serialize a log payload to a JSON string, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj)
 
 class JsonFormatter(logging.Formatter):
     """Custom formatter that outputs log records in JSON format."""
     
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # (second, formatted prefix) swapped as one tuple so that handlers on
+        # different threads sharing this formatter never see a torn pair
+        self._last = (None, "")
+    
+    def _timestamp(self, created: float) -> str:
+        """Return the UTC ISO timestamp for created, reusing the per-second prefix."""
+        sec = int(created)
+        last_sec, prefix = self._last
+        if sec != last_sec:
+            prefix = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(sec))
+            self._last = (sec, prefix)
+        return f"{prefix}.{int((created - sec) * 1000000):06d}"
+    
     def format(self, record: logging.LogRecord) -> str:
         """Format the log record as a JSON string."""
         # Base log data
         log_data = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": self._timestamp(record.created),
             "level": record.levelname,
             "message": record.getMessage(),
         }
         
         # Add extra data if present
-        if hasattr(record, "data") and record.data is not None:
-            log_data["data"] = record.data
+        data = getattr(record, "data", None)
+        if data is not None:
+            log_data["data"] = data
             
-        # Add exception info if present
+        # Add exception info if present, caching the traceback text on the record
+        # as logging.Formatter does so the console and file handlers share it
         if record.exc_info:
-            log_data["exception"] = self.formatException(record.exc_info)
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+            log_data["exception"] = record.exc_text
             
-        return json.dumps(log_data)
+        return _dumps(log_data)
 
-def setup_logger(name: str, log_file: Optional[str] = None) -> logging.Logger:
+class BufferedFileHandler(logging.FileHandler):
+    """
+    FileHandler that lets records accumulate in a large write buffer.
+    
+    Records at ERROR or above are flushed immediately. Anything else is flushed
+    by a daemon timer at most flush_interval seconds after it was written, so a
+    lone record still reaches the file while a long command runs. close()
+    cancels the timer and flushes the rest.
+    """
+    
+    def __init__(self, filename: str, mode: str = 'a', encoding: Optional[str] = None,
+                 delay: bool = False, buffer_size: int = 65536, flush_interval: float = 0.2):
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._timer: Optional[threading.Timer] = None
+        super().__init__(filename, mode, encoding, delay)
+    
+    def _open(self):
+        """Open the log file with a buffer of buffer_size bytes."""
+        return open(self.baseFilename, self.mode, buffering=self.buffer_size, encoding=self.encoding)
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        """Write the record, flushing errors now and scheduling a flush for the rest."""
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(self.format(record) + self.terminator)
+            if record.levelno >= logging.ERROR:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self._timed_flush)
+                self._timer.daemon = True
+                self._timer.start()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+    
+    def _timed_flush(self) -> None:
+        """Flush from the timer thread, under the handler lock."""
+        self.acquire()
+        try:
+            self._timer = None
+            self.flush()
+        finally:
+            self.release()
+    
+    def close(self) -> None:
+        """Cancel any pending timed flush, then flush and close the file."""
+        self.acquire()
+        try:
+            timer, self._timer = self._timer, None
+        finally:
+            self.release()
+        if timer is not None:
+            timer.cancel()
+        super().close()
+
+class JsonQueueHandler(QueueHandler):
+    """
+    Queue handler that hands records to a background QueueListener.
+    
+    The listener owns the real console/file handlers, so the calling thread only
+    enqueues the record. Closing this handler stops the listener, flushing any
+    queued records first.
+    """
+    
+    def __init__(self, log_queue: queue.SimpleQueue, listener: QueueListener):
+        super().__init__(log_queue)
+        self.listener = listener
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Merge args into the message but keep exc_info for the JSON formatter."""
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+    
+    def close(self) -> None:
+        """Stop the listener and close the handlers it owns."""
+        if self.listener is not None:
+            self.listener.stop()
+            for handler in self.listener.handlers:
+                handler.close()
+            self.listener = None
+        super().close()
+
+# Stateless apart from the timestamp cache, so one instance serves every handler
+_JSON_FORMATTER = JsonFormatter()
+
+def setup_logger(name: str, log_file: Optional[str] = None, queued: bool = False) -> logging.Logger:
     """
     Set up and return a logger instance that outputs logs in JSON format.
     
     Args:
         name: The name of the logger
         log_file: Optional path to a log file. If not provided, logs to console only.
+        queued: If True, format and write records on a background thread via a
+            QueueHandler/QueueListener pair instead of on the calling thread.
         
     Returns:
         logging.Logger: Configured logger instance
@@ -41,46 +167,63 @@ def setup_logger(name: str, log_file: Optional[str] = None) -> logging.Logger:
     # Prevent propagation to avoid duplicate logs
     logger.propagate = False
     
-    # Remove any existing handlers
+    # Remove any existing handlers, stopping a previous background listener
+    for handler in logger.handlers:
+        if isinstance(handler, JsonQueueHandler):
+            handler.close()
     logger.handlers = []
     
-    # Create JSON formatter
-    formatter = JsonFormatter()
-    
     # Console handler
     console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    console_handler.setFormatter(_JSON_FORMATTER)
+    handlers = [console_handler]
     
     # File handler if log_file is specified
     if log_file:
-        file_handler = logging.FileHandler(log_file)
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        file_handler = BufferedFileHandler(log_file)
+        file_handler.setFormatter(_JSON_FORMATTER)
+        handlers.append(file_handler)
+    
+    if queued:
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        logger.addHandler(JsonQueueHandler(log_queue, listener))
+    else:
+        for handler in handlers:
+            logger.addHandler(handler)
     
     return logger
 
-def log_info(logger: logging.Logger, message: str, data: Optional[Dict[str, Any]] = None) -> None:
+def log_info(logger: logging.Logger, message: str, data: Optional[Union[Dict[str, Any], Callable[[], Dict[str, Any]]]] = None) -> None:
     """
     Log an informational message with optional additional data.
     
     Args:
         logger: The logger instance to use
         message: The log message
-        data: Optional dictionary of additional data to include in the log
+        data: Optional dictionary of additional data to include in the log, or a
+            callable returning one, which is only called if INFO is enabled
     """
-    extra = {"data": data} if data else {}
-    logger.info(message, extra=extra)
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    if callable(data):
+        data = data()
+    logger.info(message, extra={"data": data} if data else None)
 
-def log_error(logger: logging.Logger, message: str, data: Optional[Dict[str, Any]] = None, exc_info: bool = True) -> None:
+def log_error(logger: logging.Logger, message: str, data: Optional[Union[Dict[str, Any], Callable[[], Dict[str, Any]]]] = None, exc_info: bool = True) -> None:
     """
     Log an error message with optional additional data and exception info.
     
     Args:
         logger: The logger instance to use
         message: The error message
-        data: Optional dictionary of additional data to include in the log
+        data: Optional dictionary of additional data to include in the log, or a
+            callable returning one, which is only called if ERROR is enabled
         exc_info: Whether to include exception information, defaults to True
     """
-    extra = {"data": data} if data else {}
-    logger.error(message, exc_info=exc_info, extra=extra)
+    if not logger.isEnabledFor(logging.ERROR):
+        return
+    if callable(data):
+        data = data()
+    logger.error(message, exc_info=exc_info, extra={"data": data} if data else None)
@@ -1,11 +1,132 @@
 import subprocess
 import logging
 import os
+import pwd
+import grp
 import shutil
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
+# Number of trailing mariabackup output lines kept for error reporting
+_OUTPUT_TAIL_LINES = 50
+
+# Connection options shared by every --backup invocation, filled from config
+_CONNECTION_OPTIONS = (
+    ('--host', 'DB_HOST'),
+    ('--port', 'DB_PORT'),
+    ('--user', 'DB_USER'),
+    ('--password', 'DB_PASSWORD'),
+)
+
+def _connection_args(config):
+    """
+    Builds the connection options for a mariabackup --backup command.
+
+    Args:
+        config (dict): The configuration parameters.
+
+    Returns:
+        list: The --host/--port/--user/--password options, plus --socket if configured.
+    """
+    args = [f"{option}={config.get(key)}" for option, key in _CONNECTION_OPTIONS]
+    if config.get('MARIADB_SOCKET'):
+        args.append(f"--socket={config['MARIADB_SOCKET']}")
+    return args
+
+def _run(command, capture=True):
+    """
+    Runs a mariabackup command, streaming its combined stdout/stderr to the log.
+
+    Output is logged at info level line by line as it is produced, so progress
+    stays visible and memory use does not grow with the amount of progress
+    mariabackup reports. Only the last _OUTPUT_TAIL_LINES lines are kept for
+    the error message.
+
+    Args:
+        command (list): The command arguments.
+        capture (bool, optional): Stream the output to the log. When False the
+            command writes straight to the inherited terminal instead. Defaults to True.
+
+    Raises:
+        subprocess.CalledProcessError: If the command exits non-zero; when capturing,
+            its stdout holds the tail of the output.
+        FileNotFoundError: If the executable does not exist.
+    """
+    if not capture:
+        subprocess.run(command, check=True)
+        return
+    tail = deque(maxlen=_OUTPUT_TAIL_LINES)
+    with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT) as proc:
+        for line in proc.stdout:
+            tail.append(line)
+            logger.info(line.decode(errors='replace').rstrip())
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, command, output=b''.join(tail))
+
+def _chown_tree(root, uid, gid):
+    """
+    Recursively changes ownership of everything below root, without following symlinks.
+
+    Args:
+        root (str): The directory to walk.
+        uid (int): The owner user id.
+        gid (int): The owner group id.
+    """
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in dirnames + filenames:
+            os.chown(os.path.join(dirpath, name), uid, gid, follow_symlinks=False)
+
+def _set_ownership(paths, user='mysql', group='mysql'):
+    """
+    Recursively sets ownership of the given directories, like chown -R user:group.
+
+    The user and group are resolved once, and each top-level subdirectory is walked
+    on its own worker thread since chown is a cheap metadata syscall that releases
+    the GIL.
+
+    Args:
+        paths (list): The directories to change, duplicates are visited once.
+        user (str, optional): The owner user name. Defaults to 'mysql'.
+        group (str, optional): The owner group name. Defaults to 'mysql'.
+
+    Raises:
+        KeyError: If the user or group does not exist.
+        OSError: If ownership of an entry cannot be changed.
+    """
+    uid = pwd.getpwnam(user).pw_uid
+    gid = grp.getgrnam(group).gr_gid
+    subdirs = []
+    for path in dict.fromkeys(paths):
+        os.chown(path, uid, gid, follow_symlinks=False)
+        with os.scandir(path) as entries:
+            for entry in entries:
+                os.chown(entry.path, uid, gid, follow_symlinks=False)
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+    with ThreadPoolExecutor(max_workers=min(32, os.cpu_count() or 1)) as executor:
+        # Consume the results so the first failure is raised here
+        list(executor.map(lambda subdir: _chown_tree(subdir, uid, gid), subdirs))
+
+def _prepare_command(mariadb_backup_path, target_dir, incremental_dir=None):
+    """
+    Builds a mariabackup --prepare command.
+
+    Args:
+        mariadb_backup_path (str): Path to the mariabackup executable.
+        target_dir (str): The directory of the backup to prepare.
+        incremental_dir (str, optional): Incremental backup to apply. Defaults to None.
+
+    Returns:
+        list: The command arguments.
+    """
+    command = [mariadb_backup_path, "--prepare", f"--target-dir={target_dir}"]
+    if incremental_dir:
+        command.append(f"--incremental-dir={incremental_dir}")
+    return command
+
 def verify_test_instance(config):
     """
     Verifies if this is the test instance by checking for test_db database.
@@ -63,22 +184,14 @@ def take_full_backup(target_dir, config):
     db_host = config.get('DB_HOST')
     db_port = config.get('DB_PORT')
     db_user = config.get('DB_USER')
-    db_password = config.get('DB_PASSWORD')
 
     # Build base command with common options
     command = [
         mariadb_backup_path,
         "--backup",
         f"--target-dir={target_dir}",
-        f"--host={db_host}",
-        f"--port={db_port}",
-        f"--user={db_user}",
-        f"--password={db_password}",
+        *_connection_args(config),
     ]
-    
-    # Add socket file if specified
-    if config.get('MARIADB_SOCKET'):
-        command.append(f"--socket={config['MARIADB_SOCKET']}")
 
     # Log connection details for debugging
     logger.info(f"Starting full backup to {target_dir} with connection details:")
@@ -88,7 +201,7 @@ def take_full_backup(target_dir, config):
     logger.info(f"Command: {' '.join(command)}")
     print(f"Executing command: {' '.join(command)}")
     try:
-        subprocess.run(command, check=True, capture_output=True)
+        _run(command)
         logger.info(f"Full backup to {target_dir} completed successfully.")
         return True
     except subprocess.CalledProcessError as e:
@@ -133,7 +246,6 @@ def take_incremental_backup(target_dir, basedir, config):
     db_host = config.get('DB_HOST')
     db_port = config.get('DB_PORT')
     db_user = config.get('DB_USER')
-    db_password = config.get('DB_PASSWORD')
 
     # Build base command with common options
     command = [
@@ -141,15 +253,8 @@ def take_incremental_backup(target_dir, basedir, config):
         "--backup",
         f"--target-dir={target_dir}",
         f"--incremental-basedir={basedir}",
-        f"--host={db_host}",
-        f"--port={db_port}",
-        f"--user={db_user}",
-        f"--password={db_password}",
+        *_connection_args(config),
     ]
-    
-    # Add socket file if specified
-    if config.get('MARIADB_SOCKET'):
-        command.append(f"--socket={config['MARIADB_SOCKET']}")
 
     # Log connection details for debugging
     logger.info(f"Starting incremental backup to {target_dir} based on {basedir} with connection details:")
@@ -159,7 +264,7 @@ def take_incremental_backup(target_dir, basedir, config):
     logger.info(f"Command: {' '.join(command)}")
     print(f"Executing command: {' '.join(command)}")
     try:
-        subprocess.run(command, check=True, capture_output=True)
+        _run(command)
         logger.info(f"Incremental backup to {target_dir} completed successfully.")
         return True
     except subprocess.CalledProcessError as e:
@@ -215,36 +320,29 @@ def prepare_backup(target_dir, incremental_dirs=None, config=None):
             # 1. Find the full backup in the chain directory
             # 2. Prepare the full backup
             # 3. Apply the incremental to it
-            full_backups = [d for d in os.listdir(chain_dir) if d.startswith('full_')]
+            with os.scandir(chain_dir) as entries:
+                full_backups = [entry.path for entry in entries
+                                if entry.name.startswith('full_') and entry.is_dir()]
             if not full_backups:
                 logger.error("No full backup found in chain directory")
                 return False
                 
-            # Get the latest full backup
-            full_backup_dir = os.path.join(chain_dir, sorted(full_backups)[-1])
+            # Get the latest full backup, names sort by their timestamp
+            full_backup_dir = max(full_backups)
             
             # First prepare the base backup
-            base_command = [
-                mariadb_backup_path,
-                "--prepare",
-                f"--target-dir={full_backup_dir}",
-            ]
+            base_command = _prepare_command(mariadb_backup_path, full_backup_dir)
             
             logger.info(f"Preparing base backup in {full_backup_dir}")
             print(f"Executing command: {' '.join(base_command)}")
-            subprocess.run(base_command, check=True, capture_output=True)
+            _run(base_command)
             logger.info(f"Base backup in {full_backup_dir} prepared successfully.")
             
             # Now apply the incremental backup
-            inc_command = [
-                mariadb_backup_path,
-                "--prepare",
-                f"--target-dir={full_backup_dir}",
-                f"--incremental-dir={target_dir}"
-            ]
+            inc_command = _prepare_command(mariadb_backup_path, full_backup_dir, target_dir)
             logger.info(f"Applying incremental backup from {target_dir}")
             print(f"Executing command: {' '.join(inc_command)}")
-            subprocess.run(inc_command, check=True, capture_output=True)
+            _run(inc_command)
             logger.info(f"Incremental backup from {target_dir} applied successfully.")
             
             # Copy the prepared full backup (which now includes the incremental) to target_dir
@@ -257,41 +355,28 @@ def prepare_backup(target_dir, incremental_dirs=None, config=None):
             # Handle both full and incremental backups
             if not incremental_dirs:
                 # For full backup, just prepare it directly
-                base_command = [
-                    mariadb_backup_path,
-                    "--prepare",
-                    f"--target-dir={target_dir}",
-                ]
+                base_command = _prepare_command(mariadb_backup_path, target_dir)
                 
                 logger.info(f"Preparing base backup in {target_dir}")
                 print(f"Executing command: {' '.join(base_command)}")
-                subprocess.run(base_command, check=True, capture_output=True)
+                _run(base_command)
                 logger.info(f"Base backup in {target_dir} prepared successfully.")
                 return True
             else:
                 # First prepare the base backup
-                base_command = [
-                    mariadb_backup_path,
-                    "--prepare",
-                    f"--target-dir={target_dir}",
-                ]
+                base_command = _prepare_command(mariadb_backup_path, target_dir)
                 
                 logger.info(f"Preparing base backup in {target_dir}")
                 print(f"Executing command: {' '.join(base_command)}")
-                subprocess.run(base_command, check=True, capture_output=True)
+                _run(base_command)
                 logger.info(f"Base backup in {target_dir} prepared successfully.")
                 
                 # Then apply each incremental one at a time
                 for inc_dir in incremental_dirs:
-                    inc_command = [
-                        mariadb_backup_path,
-                        "--prepare",
-                        f"--target-dir={target_dir}",
-                        f"--incremental-dir={inc_dir}"
-                    ]
+                    inc_command = _prepare_command(mariadb_backup_path, target_dir, inc_dir)
                     logger.info(f"Applying incremental backup from {inc_dir}")
                     print(f"Executing command: {' '.join(inc_command)}")
-                    subprocess.run(inc_command, check=True, capture_output=True)
+                    _run(inc_command)
                     logger.info(f"Incremental backup from {inc_dir} applied successfully.")
                 
                 return True
@@ -413,8 +498,8 @@ def restore_backup(backup_dir, config, method='copy-back'):
     logger.info(f"Restoring backup from {backup_dir} using {method}")
     print(f"Executing command: {' '.join(command)}")
     try:
-        # Restore the backup
-        subprocess.run(command, check=True, capture_output=False)
+        # Restore the backup, showing mariabackup's progress on the terminal
+        _run(command, capture=False)
         
         # Fix ownership after restore
         restored_dirs = [
@@ -424,9 +509,9 @@ def restore_backup(backup_dir, config, method='copy-back'):
         ]
         try:
             # Set ownership to mysql:mysql
-            subprocess.run(['chown', '-R', 'mysql:mysql'] + restored_dirs, check=True)
+            _set_ownership(restored_dirs)
             logger.info("Fixed ownership after restore")
-        except subprocess.CalledProcessError as e:
+        except (KeyError, OSError) as e:
             logger.error(f"Failed to fix ownership after restore: {e}")
             return False
             
@@ -1,7 +1,9 @@
 import os
 import time
 import logging
+import shlex
 import subprocess
+from functools import lru_cache
 from typing import Union
 from . import s3
 from . import mariadb
@@ -10,6 +12,30 @@ from . import config as config_module
 
 logger = logging.getLogger(__name__)
 
+_RESTORE_METHODS = frozenset(("copy-back", "move-back"))
+
+# Characters that need a shell to interpret a configured server command,
+# including '#' so inline comments are still dropped by the shell
+_SHELL_METACHARACTERS = frozenset('$`|&;<>(){}*?[]~#\n')
+
+@lru_cache(maxsize=8)
+def _command_args(command):
+    """
+    Splits a configured server command into an argv list when no shell is needed.
+
+    Args:
+        command (str): The MYSQL_START_COMMAND or MYSQL_STOP_COMMAND value
+
+    Returns:
+        tuple: (args, shell) to pass to subprocess.run
+    """
+    if _SHELL_METACHARACTERS.isdisjoint(command):
+        args = tuple(shlex.split(command))
+        # Leading VAR=value assignments are a shell feature as well
+        if args and '=' not in args[0]:
+            return args, False
+    return command, True
+
 def restore_specific_backup(backup_identifier, restore_method, config):
     """
     Orchestrates the restore process for a specified backup.
@@ -22,7 +48,7 @@ def restore_specific_backup(backup_identifier, restore_method, config):
     Returns:
         bool: True on success, False on failure
     """
-    if restore_method not in ['copy-back', 'move-back']:
+    if restore_method not in _RESTORE_METHODS:
         logger.error(f"Invalid restore method: {restore_method}")
         return False
 
@@ -38,7 +64,7 @@ def restore_specific_backup(backup_identifier, restore_method, config):
             return False
 
         # Stop MariaDB server
-        if not stop_mariadb_server():
+        if not stop_mariadb_server(config):
             logger.error("Failed to stop MariaDB server")
             return False
 
@@ -53,7 +79,7 @@ def restore_specific_backup(backup_identifier, restore_method, config):
 
         finally:
             # Always attempt to start MariaDB server, even if restore failed
-            if not start_mariadb_server():
+            if not start_mariadb_server(config):
                 logger.error("Failed to start MariaDB server")
                 return False
 
@@ -74,7 +100,8 @@ def restore_specific_backup(backup_identifier, restore_method, config):
                                 '-e', 'SELECT 1'
                             ],
                             check=True,
-                            capture_output=True
+                            stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL
                         )
                         server_started = True
                         logger.info("MariaDB server is accessible after restore")
@@ -114,27 +141,39 @@ def download_and_prepare_backup(backup_prefix, local_staging_dir, config):
             logger.error("S3_BUCKET_NAME not found in config")
             return False
 
-        # Create a temporary directory for the compressed file
-        temp_dir = os.path.join(local_staging_dir, 'temp')
-        os.makedirs(temp_dir, exist_ok=True)
-
         # Get the tar.gz filename from the backup prefix
         tar_filename = os.path.basename(backup_prefix.rstrip('/'))
-        tar_path = os.path.join(temp_dir, tar_filename)
 
-        # Download the backup file directly
-        logger.info(f"Attempting to download backup from s3://{s3_bucket}/{backup_prefix}")
-        if not s3.download_file(s3_bucket, backup_prefix, tar_path, config):
-            logger.error("Failed to download backup file from S3")
-            return False
+        if config.get('STREAM_EXTRACT'):
+            # Extract straight from the S3 response, the archive never lands on disk
+            extract_dir = os.path.join(local_staging_dir, 'extracted')
+            body = s3.open_object_stream(s3_bucket, backup_prefix, config)
+            if body is None:
+                logger.error("Failed to open backup stream from S3")
+                return False
+            try:
+                backup_dir = utils.extract_archive_stream(body, extract_dir, tar_filename)
+            finally:
+                body.close()
+        else:
+            # Create a temporary directory for the compressed file
+            temp_dir = os.path.join(local_staging_dir, 'temp')
+            os.makedirs(temp_dir, exist_ok=True)
+            tar_path = os.path.join(temp_dir, tar_filename)
 
-        if not os.path.exists(tar_path):
-            logger.error(f"Downloaded file not found at expected path: {tar_path}")
-            return False
-        extract_dir = os.path.join(local_staging_dir, 'extracted')
+            # Download the backup file directly
+            logger.info(f"Attempting to download backup from s3://{s3_bucket}/{backup_prefix}")
+            if not s3.download_file(s3_bucket, backup_prefix, tar_path, config):
+                logger.error("Failed to download backup file from S3")
+                return False
+
+            if not os.path.exists(tar_path):
+                logger.error(f"Downloaded file not found at expected path: {tar_path}")
+                return False
+            extract_dir = os.path.join(local_staging_dir, 'extracted')
 
-        # Extract the backup
-        backup_dir = utils.decompress_archive(tar_path, extract_dir)
+            # Extract the backup
+            backup_dir = utils.decompress_archive(tar_path, extract_dir)
         if not backup_dir:
             logger.error("Failed to extract backup archive")
             return False
@@ -151,21 +190,28 @@ def download_and_prepare_backup(backup_prefix, local_staging_dir, config):
         logger.error(f"Unexpected error during backup download and preparation: {str(e)}")
         return False
 
-def stop_mariadb_server():
+def stop_mariadb_server(config=None):
     """
     Stops the MariaDB server.
 
+    Args:
+        config (dict, optional): Configuration parameters. Loaded from the default
+            .env file when not given.
+
     Returns:
         bool: True on success, False on failure
     """
     try:
-        config = config_module.load_config()
+        if config is None:
+            config = config_module.load_config()
         if config.get('MYSQL_STOP_COMMAND'):
             # Use configured command
-            subprocess.run(config['MYSQL_STOP_COMMAND'], shell=True, check=True)
+            args, shell = _command_args(config['MYSQL_STOP_COMMAND'])
+            subprocess.run(args, shell=shell, check=True)
         else:
             # Default to systemctl
-            subprocess.run(['systemctl', 'stop', 'mariadb'], check=True, capture_output=True )
+            subprocess.run(['systemctl', 'stop', 'mariadb'], check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
         logger.info("MariaDB server stopped successfully")
         return True
     except subprocess.CalledProcessError as e:
@@ -179,21 +225,28 @@ def stop_mariadb_server():
         logger.error(f"Unexpected error stopping MariaDB server: {str(e)}")
         return False
 
-def start_mariadb_server():
+def start_mariadb_server(config=None):
     """
     Starts the MariaDB server.
 
+    Args:
+        config (dict, optional): Configuration parameters. Loaded from the default
+            .env file when not given.
+
     Returns:
         bool: True on success, False on failure
     """
     try:
-        config = config_module.load_config()
+        if config is None:
+            config = config_module.load_config()
         if config.get('MYSQL_START_COMMAND'):
             # Use configured command
-            subprocess.run(config['MYSQL_START_COMMAND'], shell=True, check=True)
+            args, shell = _command_args(config['MYSQL_START_COMMAND'])
+            subprocess.run(args, shell=shell, check=True)
         else:
             # Default to systemctl
-            subprocess.run(['systemctl', 'start', 'mariadb'], check=True, capture_output=True)
+            subprocess.run(['systemctl', 'start', 'mariadb'], check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
         logger.info("MariaDB server started successfully")
         return True
     except subprocess.CalledProcessError as e:
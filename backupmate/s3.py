@@ -1,20 +1,104 @@
 import os
 import boto3
 import logging
+import threading
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+_MB = 1024 * 1024
+
+# Default number of parallel part requests per transfer
+_DEFAULT_MAX_CONCURRENCY = 10
+
+# Default number of objects transferred at once by upload_directory and download_directory
+_DEFAULT_PREFIX_PARALLELISM = 4
+
+# Adaptive retries back off client-side when S3 throttles the parallel requests
+_RETRIES = {'max_attempts': 10, 'mode': 'adaptive'}
+
+# boto3's default session is not thread-safe, so client creation is serialized
+_client_lock = threading.Lock()
+
+# Clients are thread-safe once built, so one per credential set and pool size is reused
+_clients = {}
+
+def _max_concurrency(config):
+    """Returns the number of parallel part requests per transfer."""
+    return int(config.get('S3_MAX_CONCURRENCY') or _DEFAULT_MAX_CONCURRENCY)
+
+def _prefix_parallelism(config):
+    """Returns the number of objects a directory transfer moves at once."""
+    return int(config.get('S3_PREFIX_PARALLELISM') or _DEFAULT_PREFIX_PARALLELISM)
+
 def _get_s3_client(config):
-    """Creates an S3 client using the provided configuration."""
-    return boto3.client(
-        's3',
-        aws_access_key_id=config.get('AWS_ACCESS_KEY_ID'),
-        aws_secret_access_key=config.get('AWS_SECRET_ACCESS_KEY'),
-        region_name=config.get('AWS_REGION')
+    """
+    Returns the shared S3 client for the credentials and region in config, creating it on first use.
+
+    The connection pool fits every directory worker running a full multipart
+    transfer, so connections are reused instead of discarded and re-opened.
+    """
+    pool_size = _max_concurrency(config) * _prefix_parallelism(config)
+    key = (config.get('AWS_ACCESS_KEY_ID'), config.get('AWS_SECRET_ACCESS_KEY'), config.get('AWS_REGION'), pool_size)
+    with _client_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = boto3.client(
+                's3',
+                aws_access_key_id=key[0],
+                aws_secret_access_key=key[1],
+                region_name=key[2],
+                config=Config(max_pool_connections=pool_size, tcp_keepalive=True, retries=_RETRIES)
+            )
+        return client
+
+def _directory_prefix(prefix):
+    """Returns prefix with a trailing '/', so it only matches keys inside that directory."""
+    return prefix if not prefix or prefix.endswith('/') else prefix + '/'
+
+def _transfer_config(config):
+    """
+    Builds the TransferConfig for uploads and downloads, so large backup archives
+    are moved as parallel multipart (byte-range) requests.
+
+    Args:
+        config (dict): Configuration, optionally containing S3_MAX_CONCURRENCY
+
+    Returns:
+        TransferConfig: The transfer settings
+    """
+    return TransferConfig(
+        multipart_threshold=8 * _MB,
+        multipart_chunksize=16 * _MB,
+        max_concurrency=_max_concurrency(config),
+        max_io_queue=1000,
+        io_chunksize=256 * 1024
     )
 
+def _iter_files(root, relative_dir=''):
+    """
+    Yields every file below root using os.scandir, building the relative path
+    while descending instead of recomputing it with os.path.relpath per file.
+
+    Args:
+        root (str): Directory to walk
+        relative_dir (str): Path of root relative to the top of the walk
+
+    Returns:
+        Iterator[tuple]: (file path, '/'-separated path relative to the top)
+    """
+    with os.scandir(root) as entries:
+        for entry in entries:
+            relative_path = relative_dir + entry.name
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_files(entry.path, relative_path + '/')
+            elif entry.is_file():
+                yield entry.path, relative_path
+
 def upload_directory(local_path, s3_bucket, s3_prefix, config):
     """
     Uploads a local directory to S3.
@@ -34,22 +118,28 @@ def upload_directory(local_path, s3_bucket, s3_prefix, config):
 
     try:
         s3_client = _get_s3_client(config)
+        transfer_config = _transfer_config(config)
         
-        # Walk through the directory
-        for root, _, files in os.walk(local_path):
-            for filename in files:
-                local_file_path = os.path.join(root, filename)
-                # Calculate relative path from base directory
-                relative_path = os.path.relpath(local_file_path, local_path)
-                # Construct S3 key with prefix
-                s3_key = os.path.join(s3_prefix, relative_path).replace('\\', '/')
-                
-                try:
-                    logger.info(f"Uploading {local_file_path} to s3://{s3_bucket}/{s3_key}")
-                    s3_client.upload_file(local_file_path, s3_bucket, s3_key)
-                except ClientError as e:
-                    logger.error(f"Failed to upload {local_file_path} to S3: {str(e)}")
-                    return False
+        def upload(local_file_path, s3_key):
+            try:
+                logger.info(f"Uploading {local_file_path} to s3://{s3_bucket}/{s3_key}")
+                s3_client.upload_file(local_file_path, s3_bucket, s3_key, Config=transfer_config)
+                return True
+            except ClientError as e:
+                logger.error(f"Failed to upload {local_file_path} to S3: {str(e)}")
+                return False
+        
+        workers = _prefix_parallelism(config)
+        # Relative paths are already '/'-separated, so keys are a single concatenation
+        key_prefix = _directory_prefix(s3_prefix.replace('\\', '/'))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            for local_file_path, relative_path in _iter_files(local_path):
+                futures.append(executor.submit(upload, local_file_path, key_prefix + relative_path))
+            
+            # Every upload has to succeed; other exceptions are re-raised here
+            if not all([future.result() for future in futures]):
+                return False
         
         logger.info(f"Successfully uploaded directory {local_path} to s3://{s3_bucket}/{s3_prefix}")
         return True
@@ -76,30 +166,41 @@ def download_directory(s3_bucket, s3_prefix, local_path, config):
     """
     try:
         s3_client = _get_s3_client(config)
+        transfer_config = _transfer_config(config)
+        s3_prefix = _directory_prefix(s3_prefix)
         
         # Create the local directory if it doesn't exist
         os.makedirs(local_path, exist_ok=True)
         
-        # List all objects with the given prefix
-        paginator = s3_client.get_paginator('list_objects_v2')
-        for page in paginator.paginate(Bucket=s3_bucket, Prefix=s3_prefix):
-            if 'Contents' not in page:
-                continue
-                
-            for obj in page['Contents']:
+        def download(key, local_file_path):
+            logger.info(f"Downloading s3://{s3_bucket}/{key} to {local_file_path}")
+            s3_client.download_file(s3_bucket, key, local_file_path, Config=transfer_config)
+        
+        workers = _prefix_parallelism(config)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            created_dirs = {local_path}
+            # List all objects with the given prefix
+            for key in _iter_keys(s3_bucket, s3_prefix, config):
                 # Get the relative path by removing the prefix
-                relative_path = obj['Key'][len(s3_prefix):].lstrip('/')
+                relative_path = key[len(s3_prefix):].lstrip('/')
                 if not relative_path:  # Skip if this is the prefix itself
                     continue
                     
                 # Construct the local file path
                 local_file_path = os.path.join(local_path, relative_path)
                 
-                # Create directories if they don't exist
-                os.makedirs(os.path.dirname(local_file_path), exist_ok=True)
+                # Create each parent directory once, not once per object
+                parent_dir = os.path.dirname(local_file_path)
+                if parent_dir not in created_dirs:
+                    os.makedirs(parent_dir, exist_ok=True)
+                    created_dirs.add(parent_dir)
                 
-                logger.info(f"Downloading s3://{s3_bucket}/{obj['Key']} to {local_file_path}")
-                s3_client.download_file(s3_bucket, obj['Key'], local_file_path)
+                futures.append(executor.submit(download, key, local_file_path))
+            
+            # Re-raise the first download failure, if any
+            for future in futures:
+                future.result()
         
         logger.info(f"Successfully downloaded s3://{s3_bucket}/{s3_prefix} to {local_path}")
         return True
@@ -111,6 +212,30 @@ def download_directory(s3_bucket, s3_prefix, local_path, config):
         logger.error(f"Unexpected error downloading from S3: {str(e)}")
         return False
 
+def _iter_objects(s3_bucket, prefix, config):
+    """Yields the LIST entries under prefix one page at a time, without collecting them."""
+    s3_client = _get_s3_client(config)
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=s3_bucket, Prefix=prefix):
+        yield from page.get('Contents', ())
+
+def _iter_keys(s3_bucket, prefix, config):
+    """Yields the keys under prefix one LIST page at a time, without collecting them."""
+    for obj in _iter_objects(s3_bucket, prefix, config):
+        yield obj['Key']
+
+def _collect_listing(objects):
+    """Collects a listing into a list, logging and returning an empty list on failure."""
+    try:
+        return list(objects)
+        
+    except ClientError as e:
+        logger.error(f"Failed to list objects in S3: {str(e)}")
+        return []
+    except Exception as e:
+        logger.error(f"Unexpected error listing S3 objects: {str(e)}")
+        return []
+
 def list_objects(s3_bucket, prefix, config):
     """
     Lists objects in an S3 bucket with a given prefix.
@@ -123,23 +248,26 @@ def list_objects(s3_bucket, prefix, config):
     Returns:
         list: List of object keys, empty list on failure
     """
-    try:
-        s3_client = _get_s3_client(config)
-        objects = []
-        
-        paginator = s3_client.get_paginator('list_objects_v2')
-        for page in paginator.paginate(Bucket=s3_bucket, Prefix=prefix):
-            if 'Contents' in page:
-                objects.extend([obj['Key'] for obj in page['Contents']])
-        
-        return objects
-        
-    except ClientError as e:
-        logger.error(f"Failed to list objects in S3: {str(e)}")
-        return []
-    except Exception as e:
-        logger.error(f"Unexpected error listing S3 objects: {str(e)}")
-        return []
+    return _collect_listing(_iter_keys(s3_bucket, prefix, config))
+
+def list_object_summaries(s3_bucket, prefix, config):
+    """
+    Lists objects in an S3 bucket with a given prefix, including the metadata
+    returned by the LIST response itself (no per-object HEAD requests).
+
+    Args:
+        s3_bucket (str): Name of the S3 bucket
+        prefix (str): Prefix to filter objects
+        config (dict): Configuration containing AWS credentials
+
+    Returns:
+        list: List of dicts with 'Key', 'LastModified' and 'Size', empty list on failure
+    """
+    return _collect_listing({
+        'Key': obj['Key'],
+        'LastModified': obj['LastModified'],
+        'Size': obj['Size']
+    } for obj in _iter_objects(s3_bucket, prefix, config))
 
 def upload_file(local_path, s3_bucket, s3_key, config):
     """
@@ -163,7 +291,7 @@ def upload_file(local_path, s3_bucket, s3_key, config):
         filename = os.path.basename(local_path)
         full_s3_key = s3_key + filename
         logger.info(f"Uploading {local_path} to s3://{s3_bucket}/{full_s3_key}")
-        s3_client.upload_file(local_path, s3_bucket, full_s3_key)
+        s3_client.upload_file(local_path, s3_bucket, full_s3_key, Config=_transfer_config(config))
         return True
     except ClientError as e:
         logger.error(f"Failed to upload {local_path} to S3: {str(e)}")
@@ -172,6 +300,31 @@ def upload_file(local_path, s3_bucket, s3_key, config):
         logger.error(f"Unexpected error uploading file to S3: {str(e)}")
         return False
 
+def upload_stream(fileobj, s3_bucket, s3_key, config):
+    """
+    Uploads a readable stream to S3 as a multipart upload, without knowing its size up front.
+
+    Args:
+        fileobj (BinaryIO): Stream to read until EOF
+        s3_bucket (str): Name of the S3 bucket
+        s3_key (str): Full key of the object to create
+        config (dict): Configuration containing AWS credentials
+
+    Returns:
+        bool: True on success, False on failure
+    """
+    try:
+        s3_client = _get_s3_client(config)
+        logger.info(f"Uploading stream to s3://{s3_bucket}/{s3_key}")
+        s3_client.upload_fileobj(fileobj, s3_bucket, s3_key, Config=_transfer_config(config))
+        return True
+    except ClientError as e:
+        logger.error(f"Failed to upload stream to S3: {str(e)}")
+        return False
+    except Exception as e:
+        logger.error(f"Unexpected error uploading stream to S3: {str(e)}")
+        return False
+
 def download_file(s3_bucket, s3_key, local_path, config):
     """
     Downloads a single file from S3.
@@ -192,7 +345,7 @@ def download_file(s3_bucket, s3_key, local_path, config):
         os.makedirs(os.path.dirname(local_path), exist_ok=True)
         
         logger.info(f"Downloading s3://{s3_bucket}/{s3_key} to {local_path}")
-        s3_client.download_file(s3_bucket, s3_key, local_path)
+        s3_client.download_file(s3_bucket, s3_key, local_path, Config=_transfer_config(config))
         
         logger.info(f"Successfully downloaded file to {local_path}")
         return True
@@ -204,6 +357,29 @@ def download_file(s3_bucket, s3_key, local_path, config):
         logger.error(f"Unexpected error downloading from S3: {str(e)}")
         return False
 
+def open_object_stream(s3_bucket, s3_key, config):
+    """
+    Opens an S3 object for streaming reads, without downloading it first.
+
+    Args:
+        s3_bucket (str): Name of the S3 bucket
+        s3_key (str): Key (path) of the object in S3
+        config (dict): Configuration containing AWS credentials
+
+    Returns:
+        StreamingBody: Readable body of the object, None on failure. The caller must close it.
+    """
+    try:
+        s3_client = _get_s3_client(config)
+        logger.info(f"Streaming s3://{s3_bucket}/{s3_key}")
+        return s3_client.get_object(Bucket=s3_bucket, Key=s3_key)['Body']
+    except ClientError as e:
+        logger.error(f"Failed to open S3 object stream: {str(e)}")
+        return None
+    except Exception as e:
+        logger.error(f"Unexpected error opening S3 object stream: {str(e)}")
+        return None
+
 def delete_object(s3_bucket, s3_key, config):
     """
     Deletes an object from S3.
@@ -241,17 +417,9 @@ def get_latest_backup_prefix(s3_bucket, prefix, config):
         str: Latest backup prefix, None if no backups found or on error
     """
     try:
-        objects = list_objects(s3_bucket, prefix, config)
-        if not objects:
-            return None
-            
-        # Sort objects by name (which includes timestamp) in descending order
-        sorted_objects = sorted(objects, reverse=True)
-        if sorted_objects:
-            # Return the first (most recent) object's full path
-            return sorted_objects[0]
-            
-        return None
+        # Keys include the timestamp, so the greatest key is the most recent.
+        # Taking it while paging keeps memory flat however many keys there are.
+        return max(_iter_keys(s3_bucket, prefix, config), default=None)
         
     except Exception as e:
         logger.error(f"Failed to get latest backup prefix: {str(e)}")
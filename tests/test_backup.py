@@ -1,6 +1,10 @@
+import json
 import unittest
 from unittest.mock import patch, MagicMock, mock_open
 import os
+import shutil
+import sqlite3
+import tempfile
 import logging
 from datetime import datetime
 from backupmate import backup
@@ -9,8 +13,20 @@ from backupmate import backup
 logging.basicConfig(level=logging.DEBUG)
 
 class TestBackup(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Build the metadata schema once in an in-memory template database."""
+        cls._template = sqlite3.connect(':memory:')
+        backup._init_schema(cls._template)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._template.close()
+
     def setUp(self):
         """Set up test fixtures."""
+        # Per-test database directory so parallel workers never share a file
+        self.tmp = tempfile.mkdtemp()
         self.config = {
             'LOCAL_TEMP_DIR': 'C:\\temp\\backups',
             'CHAIN_DIR': 'C:\\temp\\backups\\chain',
@@ -22,22 +38,20 @@ class TestBackup(unittest.TestCase):
             'DB_PORT': '3306',
             'DB_USER': 'root',
             'DB_PASSWORD': 'password',
-            'IS_TEST': True,
-            'SQLITE_FILE': 'test.db'  # Explicitly set for tests
+            # No IS_TEST here: it would select test.db in the working directory,
+            # while each test needs its own database file
+            'SQLITE_FILE': os.path.join(self.tmp, 'test.db')
         }
         
-        # Initialize test database
-        self.conn = backup._init_db(self.config)
+        # Initialize test database by copying the template's pages
+        self.conn = sqlite3.connect(self.config['SQLITE_FILE'])
+        self._template.backup(self.conn)
         
     def tearDown(self):
         """Clean up test fixtures."""
         if hasattr(self, 'conn'):
             self.conn.close()
-        if os.path.exists(self.config['SQLITE_FILE']):
-            try:
-                os.remove(self.config['SQLITE_FILE'])
-            except PermissionError:
-                pass
+        shutil.rmtree(self.tmp, ignore_errors=True)
         
     @patch('backupmate.backup.shutil.rmtree')
     @patch('backupmate.backup.os.path.exists')
@@ -52,6 +66,20 @@ class TestBackup(unittest.TestCase):
         mock_rmtree.assert_called_once_with(os.path.join(self.config['LOCAL_TEMP_DIR'], 'chain'))
         mock_makedirs.assert_called_once_with(os.path.join(self.config['LOCAL_TEMP_DIR'], 'chain'), exist_ok=True)
 
+    @patch('backupmate.backup._init_schema')
+    @patch('backupmate.backup.sqlite3.connect')
+    def test_init_db_path(self, mock_connect, mock_init_schema):
+        """Tests that IS_TEST selects test.db ahead of SQLITE_FILE."""
+        cases = {
+            'configured': ({'SQLITE_FILE': '/var/lib/backupmate/meta.db'}, '/var/lib/backupmate/meta.db'),
+            'default': ({}, 'backupmate.db'),
+            'test': ({'IS_TEST': True, 'SQLITE_FILE': '/var/lib/backupmate/meta.db'}, 'test.db'),
+        }
+        for name, (config, expected) in cases.items():
+            with self.subTest(case=name):
+                backup._init_db(config)
+                mock_connect.assert_called_with(expected)
+
     def test_get_latest_local_backup(self):
         """Tests retrieving latest local backup path."""
         # Test when no backup exists
@@ -85,9 +113,7 @@ class TestBackup(unittest.TestCase):
                                        mock_take_backup, mock_exists, mock_makedirs):
         """Tests successful full backup orchestration."""
         # Configure mocks
-        def exists_side_effect(path):
-            return True
-        mock_exists.side_effect = exists_side_effect
+        mock_exists.return_value = True
         mock_take_backup.return_value = True
         mock_prepare.return_value = True
         mock_compress.return_value = True
@@ -106,6 +132,45 @@ class TestBackup(unittest.TestCase):
         mock_upload.assert_called_once()
         mock_record.assert_called_once()
         
+    @patch('backupmate.backup.os.makedirs')
+    @patch('backupmate.backup.os.path.exists')
+    @patch('backupmate.backup.mariadb.take_full_backup')
+    @patch('backupmate.backup.mariadb.prepare_backup')
+    @patch('backupmate.backup.utils.compress_directory')
+    @patch('backupmate.backup.utils.compress_directory_to_stream')
+    @patch('backupmate.backup.s3.upload_file')
+    @patch('backupmate.backup.s3.upload_stream')
+    @patch('backupmate.backup.record_backup_metadata')
+    @patch('backupmate.backup.shutil.copytree')
+    @patch('backupmate.backup.shutil.rmtree')
+    def test_perform_full_backup_stream_upload(self, mock_rmtree, mock_copytree, mock_record,
+                                               mock_upload_stream, mock_upload, mock_compress_stream,
+                                               mock_compress, mock_prepare, mock_take_backup,
+                                               mock_exists, mock_makedirs):
+        """Tests that STREAM_UPLOAD compresses straight into S3 without a local archive."""
+        mock_exists.return_value = False
+        mock_take_backup.return_value = True
+        mock_prepare.return_value = True
+        mock_upload_stream.return_value = True
+        mock_compress_stream.side_effect = lambda temp_dir, name, consume: consume('stream')
+        config = {**self.config, 'FULL_BACKUP_PREFIX': 'backups/full/', 'STREAM_UPLOAD': True}
+
+        result = backup.perform_full_backup(config)
+
+        self.assertTrue(result)
+        mock_compress.assert_not_called()
+        mock_upload.assert_not_called()
+        temp_dir, archive_name, _ = mock_compress_stream.call_args.args
+        self.assertEqual(archive_name, os.path.basename(temp_dir) + '.tar.gz')
+        mock_upload_stream.assert_called_once_with('stream', 'test-bucket', 'backups/full/' + archive_name, config)
+        mock_record.assert_called_once()
+
+        # A failed upload fails the backup and records nothing
+        mock_record.reset_mock()
+        mock_upload_stream.return_value = False
+        self.assertFalse(backup.perform_full_backup(config))
+        mock_record.assert_not_called()
+
     @patch('backupmate.backup.os.makedirs')
     @patch('backupmate.backup.os.path.exists')
     @patch('backupmate.backup.mariadb.take_full_backup')
@@ -115,9 +180,7 @@ class TestBackup(unittest.TestCase):
                                        mock_exists, mock_makedirs):
         """Tests full backup failure handling."""
         # Mock path existence checks
-        def exists_side_effect(path):
-            return True
-        mock_exists.side_effect = exists_side_effect
+        mock_exists.return_value = True
         mock_take_backup.return_value = False
         
         result = backup.perform_full_backup(self.config)
@@ -139,9 +202,7 @@ class TestBackup(unittest.TestCase):
                                                mock_exists, mock_makedirs):
         """Tests backup preparation failure handling."""
         # Mock path existence checks
-        def exists_side_effect(path):
-            return True
-        mock_exists.side_effect = exists_side_effect
+        mock_exists.return_value = True
         mock_take_backup.return_value = True
         mock_prepare.return_value = False
         
@@ -169,10 +230,7 @@ class TestBackup(unittest.TestCase):
         mock_prepare.return_value = False  # Fail at prepare to trigger cleanup
         
         # Make rmtree fail only during cleanup, not during initial chain cleanup
-        def rmtree_side_effect(path):
-            if 'full_' in path:  # Only fail when cleaning up the backup dir
-                raise OSError("Failed to remove directory")
-        mock_rmtree.side_effect = rmtree_side_effect
+        mock_rmtree.side_effect = [None, OSError("Failed to remove directory")]
         
         # Execute test
         result = backup.perform_full_backup(self.config)
@@ -199,9 +257,7 @@ class TestBackup(unittest.TestCase):
         base_dir = 'C:\\temp\\backups\\chain\\full_20230101_000000'
         
         # Configure mocks
-        def exists_side_effect(path):
-            return True
-        mock_exists.side_effect = exists_side_effect
+        mock_exists.return_value = True
         mock_get_latest.return_value = base_dir
         mock_take_backup.return_value = True
         mock_compress.return_value = True
@@ -229,9 +285,7 @@ class TestBackup(unittest.TestCase):
                                               mock_get_latest, mock_exists, mock_makedirs):
         """Tests incremental backup failure when no local base backup exists."""
         base_prefix = 'backups/full/20230101_000000'  # kept for compatibility
-        def exists_side_effect(path):
-            return True
-        mock_exists.side_effect = exists_side_effect
+        mock_exists.return_value = True
         mock_get_latest.return_value = None
         
         result = backup.perform_incremental_backup(self.config, base_prefix)
@@ -254,9 +308,7 @@ class TestBackup(unittest.TestCase):
         """Tests incremental backup mariadb failure handling with local chain."""
         base_prefix = 'backups/full/20230101_000000'  # kept for compatibility
         base_dir = 'C:\\temp\\backups\\chain\\full_20230101_000000'
-        def exists_side_effect(path):
-            return True
-        mock_exists.side_effect = exists_side_effect
+        mock_exists.return_value = True
         mock_get_latest.return_value = base_dir
         mock_take_backup.return_value = False
         
@@ -281,13 +333,9 @@ class TestBackup(unittest.TestCase):
         base_prefix = 'backups/full/20230101_000000'  # kept for compatibility
         base_dir = 'C:\\temp\\backups\\chain\\full_20230101_000000'
         
-        def exists_side_effect(path):
-            return True
-        mock_exists.side_effect = exists_side_effect
+        mock_exists.return_value = True
         
-        def rmtree_side_effect(path):
-            raise OSError("Failed to remove directory")
-        mock_rmtree.side_effect = rmtree_side_effect
+        mock_rmtree.side_effect = OSError("Failed to remove directory")
         
         mock_get_latest.return_value = base_dir
         mock_take_backup.return_value = True  # Let it proceed to cleanup
@@ -342,11 +390,10 @@ class TestBackup(unittest.TestCase):
             ('full', 'backups/full/20230101', 'success'),
             ('incremental', 'backups/inc/20230102', 'success')
         ]
-        for record in test_records:
-            cursor.execute('''
-                INSERT INTO backups (backup_type, backup_prefix, status)
-                VALUES (?, ?, ?)
-            ''', record)
+        cursor.executemany('''
+            INSERT INTO backups (backup_type, backup_prefix, status)
+            VALUES (?, ?, ?)
+        ''', test_records)
         self.conn.commit()
         
         # Test normal list
@@ -359,9 +406,13 @@ class TestBackup(unittest.TestCase):
         # Test JSON output
         result_json = backup.list_backups_from_db(self.config, output_json=True)
         self.assertIsInstance(result_json, str)
-        import json
-        json_data = json.loads(result_json)
-        self.assertEqual(len(json_data), 2)
+        expected_json = json.dumps([{
+            'type': b[0],
+            'prefix': b[1],
+            'timestamp': b[2],
+            'status': b[3]
+        } for b in result])
+        self.assertEqual(result_json, expected_json)
         
     def test_record_backup_metadata_success(self):
         """Tests successful backup metadata recording."""
@@ -1,118 +1,147 @@
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, create_autospec, DEFAULT
 import argparse
 import json
+import logging
 from io import StringIO
-import sys
+from contextlib import redirect_stdout
+from datetime import datetime
 
+from backupmate import backup, restore
 from backupmate.cli import main, handle_backup, handle_restore, handle_list
 
-class TestCLI(unittest.TestCase):
+# Autospecced stand-ins for the CLI's collaborators, built once at import so
+# signature drift fails here rather than inside individual tests
+_PERFORM_FULL_BACKUP = create_autospec(backup.perform_full_backup)
+_PERFORM_INCREMENTAL_BACKUP = create_autospec(backup.perform_incremental_backup)
+_RESTORE_SPECIFIC_BACKUP = create_autospec(restore.restore_specific_backup)
+
+# Real logger that discards records; no test asserts on logger calls
+_NULL_LOGGER = logging.getLogger('backupmate.test')
+_NULL_LOGGER.addHandler(logging.NullHandler())
+_NULL_LOGGER.propagate = False
+
+# Every attribute the CLI parser can set, with its parse-time default
+_ARG_DEFAULTS = {
+    'command': None,
+    'full': False,
+    'backup_id': None,
+    'latest_full': False,
+    'latest_incremental': False,
+    'copy_back': False,
+    'move_back': False,
+    'json': False,
+}
+
+def _make_args(**overrides):
+    """Build parsed CLI args, specifying only the values that differ from the defaults."""
+    return argparse.Namespace(**{**_ARG_DEFAULTS, **overrides})
+
+# LIST results returned out of chronological order
+_SUMMARIES = [
+    {'Key': 'backup1', 'LastModified': datetime(2023, 1, 1), 'Size': 1},
+    {'Key': 'backup3', 'LastModified': datetime(2023, 1, 3), 'Size': 1},
+    {'Key': 'backup2', 'LastModified': datetime(2023, 1, 2), 'Size': 1},
+]
+
+class CLITestCase(unittest.TestCase):
+    # Built once per class; setUp only copies it
+    _CONFIG = {
+        'LOCAL_TEMP_DIR': '/tmp/backupmate',
+        'S3_BUCKET_NAME': 'test-bucket',
+        'FULL_BACKUP_PREFIX': 'backupmate/full/',
+        'INCREMENTAL_BACKUP_PREFIX': 'backupmate/incremental/'
+    }
+
+    def setUp(self):
+        self.config = dict(self._CONFIG)
+        self.logger = _NULL_LOGGER
+        for spec in (_PERFORM_FULL_BACKUP, _PERFORM_INCREMENTAL_BACKUP, _RESTORE_SPECIFIC_BACKUP):
+            spec.reset_mock()
+            spec.return_value = None
+            spec.side_effect = None
+
+class TestMain(CLITestCase):
     def setUp(self):
-        self.config = {
-            'LOCAL_TEMP_DIR': '/tmp/backupmate',
-            'S3_BUCKET_NAME': 'test-bucket',
-            'FULL_BACKUP_PREFIX': 'backupmate/full/',
-            'INCREMENTAL_BACKUP_PREFIX': 'backupmate/incremental/'
-        }
-        self.logger = MagicMock()
-
-    @patch('backupmate.cli.load_config')
-    @patch('backupmate.cli.validate_config')
-    @patch('backupmate.cli.setup_logger')
-    @patch('argparse.ArgumentParser.parse_args')
-    def test_main_backup(self, mock_args, mock_logger, mock_validate, mock_load):
-        # Setup mocks
-        mock_args.return_value = argparse.Namespace(
-            command='backup',
-            full=True
+        super().setUp()
+        # main()'s setup collaborators, patched once here instead of per test
+        patcher = patch.multiple(
+            'backupmate.cli',
+            load_config=DEFAULT,
+            validate_config=DEFAULT,
+            setup_logger=DEFAULT
         )
-        mock_load.return_value = self.config
-        mock_validate.return_value = True
-        mock_logger.return_value = self.logger
+        self.mocks = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mocks['load_config'].return_value = self.config
+        self.mocks['validate_config'].return_value = True
+        self.mocks['setup_logger'].return_value = self.logger
+
+        args_patcher = patch('argparse.ArgumentParser.parse_args')
+        self.mock_args = args_patcher.start()
+        self.addCleanup(args_patcher.stop)
+
+    def test_main_backup(self):
+        self.mock_args.return_value = _make_args(command='backup', full=True)
 
         # Capture stdout
         stdout = StringIO()
-        sys.stdout = stdout
-
-        try:
-            with patch('backupmate.cli.perform_full_backup') as mock_backup:
-                mock_backup.return_value = True
-                result = main()
-                self.assertEqual(result, 0)
-                mock_backup.assert_called_once()
-        finally:
-            sys.stdout = sys.__stdout__
-
-    @patch('backupmate.cli.load_config')
-    @patch('backupmate.cli.validate_config')
-    @patch('backupmate.cli.setup_logger')
-    @patch('argparse.ArgumentParser.parse_args')
-    def test_main_restore(self, mock_args, mock_logger, mock_validate, mock_load):
-        # Setup mocks
-        mock_args.return_value = argparse.Namespace(
-            command='restore',
-            backup_id='test-backup',
-            latest_full=False,
-            latest_incremental=False,
-            copy_back=True,
-            move_back=False,
-            json=False
-        )
-        mock_load.return_value = self.config
-        mock_validate.return_value = True
-        mock_logger.return_value = self.logger
+        with redirect_stdout(stdout), patch('backupmate.cli.perform_full_backup', _PERFORM_FULL_BACKUP) as mock_backup:
+            mock_backup.return_value = True
+            result = main()
+            self.assertEqual(result, 0)
+            mock_backup.assert_called_once()
+
+    def test_main_restore(self):
+        self.mock_args.return_value = _make_args(command='restore', backup_id='test-backup', copy_back=True)
 
-        with patch('backupmate.cli.restore_specific_backup') as mock_restore:
+        with patch('backupmate.cli.restore_specific_backup', _RESTORE_SPECIFIC_BACKUP) as mock_restore:
             mock_restore.return_value = True
             result = main()
             self.assertEqual(result, 0)
             mock_restore.assert_called_once()
 
-    @patch('backupmate.cli.load_config')
-    @patch('backupmate.cli.validate_config')
-    @patch('backupmate.cli.setup_logger')
-    @patch('argparse.ArgumentParser.parse_args')
-    def test_main_list(self, mock_args, mock_logger, mock_validate, mock_load):
-        # Setup mocks
-        mock_args.return_value = argparse.Namespace(
-            command='list',
-            json=True
-        )
-        mock_load.return_value = self.config
-        mock_validate.return_value = True
-        mock_logger.return_value = self.logger
+    def test_main_list(self):
+        self.mock_args.return_value = _make_args(command='list', json=True)
 
         # Capture stdout
         stdout = StringIO()
-        sys.stdout = stdout
-
-        try:
-            with patch('backupmate.s3.list_objects') as mock_list:
-                mock_list.return_value = ['backup1', 'backup2']
-                result = main()
-                self.assertEqual(result, 0)
-                self.assertEqual(mock_list.call_count, 2)  # Called for both full and incremental
-                
-                # Verify JSON output
-                output = json.loads(stdout.getvalue())
-                self.assertTrue(isinstance(output, list))
-                # Should have 4 backups total (2 full + 2 incremental)
-                self.assertEqual(len(output), 4)
-                # Verify we have both types
-                types = {b['type'] for b in output}
-                self.assertEqual(types, {'full', 'incremental'})
-                # Verify structure of backup objects
-                for backup in output:
-                    self.assertIn('type', backup)
-                    self.assertIn('id', backup)
-        finally:
-            sys.stdout = sys.__stdout__
+        with redirect_stdout(stdout), patch('backupmate.s3.list_objects') as mock_list:
+            mock_list.return_value = ['backup1', 'backup2']
+            result = main()
+        self.assertEqual(result, 0)
+        self.assertEqual(mock_list.call_count, 2)  # Called for both full and incremental
+
+        # Verify JSON output
+        output = json.loads(stdout.getvalue())
+        self.assertTrue(isinstance(output, list))
+        # Should have 4 backups total (2 full + 2 incremental)
+        self.assertEqual(len(output), 4)
+        # Verify we have both types
+        types = {b['type'] for b in output}
+        self.assertEqual(types, {'full', 'incremental'})
+        # Verify structure of backup objects
+        for backup in output:
+            self.assertIn('type', backup)
+            self.assertIn('id', backup)
+
+    def test_main_no_command_skips_config(self):
+        self.mock_args.return_value = _make_args()
+
+        stdout = StringIO()
+        with redirect_stdout(stdout):
+            result = main()
+        self.assertEqual(result, 0)
+        self.assertIn('usage:', stdout.getvalue())
+        self.mocks['load_config'].assert_not_called()
+        self.mocks['validate_config'].assert_not_called()
+        self.mocks['setup_logger'].assert_not_called()
 
+class TestCLI(CLITestCase):
     def test_handle_backup_full(self):
-        args = argparse.Namespace(full=True)
+        args = _make_args(full=True)
         
-        with patch('backupmate.cli.perform_full_backup') as mock_backup:
+        with patch('backupmate.cli.perform_full_backup', _PERFORM_FULL_BACKUP) as mock_backup:
             mock_backup.return_value = True
             result = handle_backup(args, self.config, self.logger)
             self.assertTrue(result)
@@ -120,49 +149,33 @@ class TestCLI(unittest.TestCase):
 
     @patch('backupmate.s3.get_latest_backup_prefix')
     def test_handle_backup_incremental(self, mock_get_latest):
-        args = argparse.Namespace(full=False)
+        args = _make_args(full=False)
         mock_get_latest.return_value = 'backups/full/latest'
         
-        with patch('backupmate.cli.perform_incremental_backup') as mock_backup:
+        with patch('backupmate.cli.perform_incremental_backup', _PERFORM_INCREMENTAL_BACKUP) as mock_backup:
             mock_backup.return_value = True
             result = handle_backup(args, self.config, self.logger)
             self.assertTrue(result)
             mock_backup.assert_called_once_with(self.config, 'backups/full/latest')
 
     def test_handle_restore_validation(self):
-        # Test multiple restore options specified
-        args = argparse.Namespace(
-            backup_id='test',
-            latest_full=True,
-            latest_incremental=False,
-            copy_back=True,
-            move_back=False
-        )
-        result = handle_restore(args, self.config, self.logger)
-        self.assertFalse(result)
-
-        # Test conflicting restore methods
-        args = argparse.Namespace(
-            backup_id='test',
-            latest_full=False,
-            latest_incremental=False,
-            copy_back=True,
-            move_back=True
-        )
-        result = handle_restore(args, self.config, self.logger)
-        self.assertFalse(result)
+        cases = [
+            # Multiple restore options specified
+            ("multi_option", dict(latest_full=True, copy_back=True, move_back=False)),
+            # Conflicting restore methods
+            ("conflict_methods", dict(latest_full=False, copy_back=True, move_back=True)),
+        ]
+        for name, kwargs in cases:
+            with self.subTest(case=name):
+                args = _make_args(backup_id='test', **kwargs)
+                result = handle_restore(args, self.config, self.logger)
+                self.assertFalse(result)
 
     def test_handle_restore_success_with_backup_id(self):
         """Test restore with specific backup ID"""
-        args = argparse.Namespace(
-            backup_id='test',
-            latest_full=False,
-            latest_incremental=False,
-            copy_back=True,
-            move_back=False
-        )
+        args = _make_args(backup_id='test', copy_back=True)
         
-        with patch('backupmate.cli.restore_specific_backup') as mock_restore:
+        with patch('backupmate.cli.restore_specific_backup', _RESTORE_SPECIFIC_BACKUP) as mock_restore:
             mock_restore.return_value = True
             result = handle_restore(args, self.config, self.logger)
             self.assertTrue(result)
@@ -172,104 +185,108 @@ class TestCLI(unittest.TestCase):
                 config=self.config
             )
 
-    @patch('backupmate.s3.list_objects')
-    def test_handle_restore_success_with_latest_full(self, mock_list_objects):
+    @patch('backupmate.s3.list_object_summaries')
+    def test_handle_restore_success_with_latest_full(self, mock_list_summaries):
         """Test restore with --latest-full flag"""
-        args = argparse.Namespace(
-            backup_id=None,
-            latest_full=True,
-            latest_incremental=False,
-            copy_back=True,
-            move_back=False
-        )
+        args = _make_args(latest_full=True, copy_back=True)
         
-        mock_list_objects.return_value = ['backup1', 'backup2', 'backup3']
+        mock_list_summaries.return_value = _SUMMARIES
         
-        with patch('backupmate.cli.restore_specific_backup') as mock_restore:
+        with patch('backupmate.cli.restore_specific_backup', _RESTORE_SPECIFIC_BACKUP) as mock_restore:
             mock_restore.return_value = True
             result = handle_restore(args, self.config, self.logger)
             self.assertTrue(result)
             mock_restore.assert_called_once_with(
-                backup_identifier='backup3',  # Should use latest backup
+                backup_identifier='backup3',  # Should use most recently modified backup
                 restore_method='copy-back',
                 config=self.config
             )
-            mock_list_objects.assert_called_once_with(
+            mock_list_summaries.assert_called_once_with(
                 self.config['S3_BUCKET_NAME'],
                 self.config['FULL_BACKUP_PREFIX'],
                 self.config
             )
 
-    @patch('backupmate.s3.list_objects')
-    def test_handle_restore_success_with_latest_incremental(self, mock_list_objects):
+    @patch('backupmate.s3.list_object_summaries')
+    def test_handle_restore_success_with_latest_incremental(self, mock_list_summaries):
         """Test restore with --latest-incremental flag"""
-        args = argparse.Namespace(
-            backup_id=None,
-            latest_full=False,
-            latest_incremental=True,
-            copy_back=True,
-            move_back=False
-        )
+        args = _make_args(latest_incremental=True, copy_back=True)
         
-        mock_list_objects.return_value = ['backup1', 'backup2', 'backup3']
+        mock_list_summaries.return_value = _SUMMARIES
         
-        with patch('backupmate.cli.restore_specific_backup') as mock_restore:
+        with patch('backupmate.cli.restore_specific_backup', _RESTORE_SPECIFIC_BACKUP) as mock_restore:
             mock_restore.return_value = True
             result = handle_restore(args, self.config, self.logger)
             self.assertTrue(result)
             mock_restore.assert_called_once_with(
-                backup_identifier='backup3',  # Should use latest backup
+                backup_identifier='backup3',  # Should use most recently modified backup
                 restore_method='copy-back',
                 config=self.config
             )
-            mock_list_objects.assert_called_once_with(
+            mock_list_summaries.assert_called_once_with(
                 self.config['S3_BUCKET_NAME'],
                 self.config['INCREMENTAL_BACKUP_PREFIX'],
                 self.config
             )
 
-    @patch('backupmate.s3.list_objects')
-    def test_handle_restore_no_backups_found(self, mock_list_objects):
+    @patch('backupmate.s3.list_object_summaries')
+    def test_handle_restore_no_backups_found(self, mock_list_summaries):
         """Test restore when no backups are found"""
-        args = argparse.Namespace(
-            backup_id=None,
-            latest_full=True,
-            latest_incremental=False,
-            copy_back=True,
-            move_back=False
-        )
+        args = _make_args(latest_full=True, copy_back=True)
         
-        mock_list_objects.return_value = []
+        mock_list_summaries.return_value = []
         
-        with patch('backupmate.cli.restore_specific_backup') as mock_restore:
+        with patch('backupmate.cli.restore_specific_backup', _RESTORE_SPECIFIC_BACKUP) as mock_restore:
             result = handle_restore(args, self.config, self.logger)
             self.assertFalse(result)
             mock_restore.assert_not_called()
 
     def test_handle_list(self):
-        args = argparse.Namespace(json=False)
+        args = _make_args()
         
-        with patch('backupmate.s3.list_objects') as mock_list:
+        # Capture stdout
+        stdout = StringIO()
+        with redirect_stdout(stdout), patch('backupmate.s3.list_objects') as mock_list:
             mock_list.return_value = ['backup1', 'backup2']
-            
-            # Capture stdout
-            stdout = StringIO()
-            sys.stdout = stdout
-            
-            try:
-                result = handle_list(args, self.config, self.logger)
-                self.assertTrue(result)
-                self.assertEqual(mock_list.call_count, 2)  # Called for both full and incremental
-                
-                # Verify text output format
-                output = stdout.getvalue()
-                self.assertIn('Full Backups:', output)
-                self.assertIn('Incremental Backups:', output)
-                # Each backup should appear in output
-                for backup_id in ['backup1', 'backup2']:
-                    self.assertIn(backup_id, output)
-            finally:
-                sys.stdout = sys.__stdout__
+            result = handle_list(args, self.config, self.logger)
+        self.assertTrue(result)
+        self.assertEqual(mock_list.call_count, 2)  # Called for both full and incremental
+        # Lookups run concurrently, so don't depend on call order
+        mock_list.assert_any_call('test-bucket', 'backupmate/full/', self.config)
+        mock_list.assert_any_call('test-bucket', 'backupmate/incremental/', self.config)
+
+        # Verify text output format
+        output = stdout.getvalue()
+        self.assertIn('Full Backups:', output)
+        self.assertIn('Incremental Backups:', output)
+        # Each backup should appear in output
+        for backup_id in ['backup1', 'backup2']:
+            self.assertIn(backup_id, output)
+
+    def test_handle_list_json_format(self):
+        args = _make_args(json=True)
+
+        stdout = StringIO()
+        with redirect_stdout(stdout), patch('backupmate.s3.list_objects') as mock_list:
+            # The two prefixes are listed on separate threads, so answer by prefix
+            mock_list.side_effect = lambda bucket, prefix, config: [prefix + 'backup']
+            result = handle_list(args, self.config, self.logger)
+        self.assertTrue(result)
+        expected = [
+            {'id': self.config['FULL_BACKUP_PREFIX'] + 'backup', 'type': 'full'},
+            {'id': self.config['INCREMENTAL_BACKUP_PREFIX'] + 'backup', 'type': 'incremental'}
+        ]
+        self.assertEqual(stdout.getvalue(), json.dumps(expected, indent=2) + '\n')
+
+    def test_handle_list_json_empty(self):
+        args = _make_args(json=True)
+
+        stdout = StringIO()
+        with redirect_stdout(stdout), patch('backupmate.s3.list_objects') as mock_list:
+            mock_list.return_value = []
+            result = handle_list(args, self.config, self.logger)
+        self.assertTrue(result)
+        self.assertEqual(json.loads(stdout.getvalue()), [])
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,28 +1,61 @@
 import os
 import unittest
+from io import StringIO
+from unittest.mock import patch
 from backupmate import config
 
+# Marks a key to drop from the baseline config
+_MISSING = object()
+
 class TestConfig(unittest.TestCase):
+    # Valid configuration shared by the validate_config tests
+    _BASELINE = {
+        "DB_HOST": "localhost",
+        "DB_PORT": "3306",
+        "DB_USER": "testuser",
+        "DB_PASSWORD": "testpassword",
+        "MARIADB_BACKUP_PATH": "/usr/bin/mariabackup",
+        "S3_BUCKET_NAME": "test-bucket",
+        "AWS_ACCESS_KEY_ID": "TEST_KEY_ID",
+        "AWS_SECRET_ACCESS_KEY": "TEST_SECRET_KEY",
+        "AWS_REGION": "us-east-1",
+        "LOCAL_TEMP_DIR": "/tmp/backupmate",
+        "FULL_BACKUP_PREFIX": "backupmate/full/",
+        "INCREMENTAL_BACKUP_PREFIX": "backupmate/incremental/",
+        "FULL_BACKUP_SCHEDULE": "weekly",
+    }
+
+    def _assert_invalid(self, cases):
+        """Asserts each (field, value, message) change to the baseline fails validation."""
+        for field, value, message in cases:
+            with self.subTest(field=field, value=value):
+                invalid_config = {**self._BASELINE, field: value}
+                if value is _MISSING:
+                    del invalid_config[field]
+                with self.assertRaises(ValueError) as context:
+                    config.validate_config(invalid_config)
+                self.assertIn(message, str(context.exception))
+
     def test_load_config(self):
         """Tests if the configuration is loaded correctly."""
-        # Create a temporary .env file for testing
-        with open(".backupmate.env", "w") as f:
-            f.write("DB_HOST=localhost\n")
-            f.write("DB_PORT=3306\n")
-            f.write("DB_USER=testuser\n")
-            f.write("DB_PASSWORD=testpassword\n")
-            f.write("MARIADB_BACKUP_PATH=/usr/bin/mariabackup\n")
-            f.write("S3_BUCKET_NAME=test-bucket\n")
-            f.write("AWS_ACCESS_KEY_ID=TEST_KEY_ID\n")
-            f.write("AWS_SECRET_ACCESS_KEY=TEST_SECRET_KEY\n")
-            f.write("AWS_REGION=us-east-1\n")
-            f.write("LOCAL_TEMP_DIR=/tmp/backupmate\n")
-            f.write("FULL_BACKUP_PREFIX=backupmate/full/\n")
-            f.write("INCREMENTAL_BACKUP_PREFIX=backupmate/incremental/\n")
-            f.write("FULL_BACKUP_SCHEDULE=weekly\n")
-            f.write("SQLITE_FILE=backupmate.db\n")
-
-        loaded_config = config.load_config()
+        env = StringIO(
+            "DB_HOST=localhost\n"
+            "DB_PORT=3306\n"
+            "DB_USER=testuser\n"
+            "DB_PASSWORD=testpassword\n"
+            "MARIADB_BACKUP_PATH=/usr/bin/mariabackup\n"
+            "S3_BUCKET_NAME=test-bucket\n"
+            "AWS_ACCESS_KEY_ID=TEST_KEY_ID\n"
+            "AWS_SECRET_ACCESS_KEY=TEST_SECRET_KEY\n"
+            "AWS_REGION=us-east-1\n"
+            "LOCAL_TEMP_DIR=/tmp/backupmate\n"
+            "FULL_BACKUP_PREFIX=backupmate/full/\n"
+            "INCREMENTAL_BACKUP_PREFIX=backupmate/incremental/\n"
+            "FULL_BACKUP_SCHEDULE=weekly\n"
+            "SQLITE_FILE=backupmate.db\n"
+        )
+
+        loaded_config = config.load_config(stream=env)
         self.assertEqual(loaded_config["DB_HOST"], "localhost")
         self.assertEqual(loaded_config["DB_PORT"], "3306")
         self.assertEqual(loaded_config["DB_USER"], "testuser")
@@ -37,27 +70,9 @@ class TestConfig(unittest.TestCase):
         self.assertEqual(loaded_config["INCREMENTAL_BACKUP_PREFIX"], "backupmate/incremental/")
         self.assertEqual(loaded_config["FULL_BACKUP_SCHEDULE"], "weekly")
 
-        # Clean up the temporary .env file
-        os.remove(".backupmate.env")
-
     def test_validate_config_success(self):
         """Tests if valid configuration passes validation."""
-        valid_config = {
-            "DB_HOST": "localhost",
-            "DB_PORT": "3306",
-            "DB_USER": "testuser",
-            "DB_PASSWORD": "testpassword",
-            "MARIADB_BACKUP_PATH": "/usr/bin/mariabackup",
-            "S3_BUCKET_NAME": "test-bucket",
-            "AWS_ACCESS_KEY_ID": "TEST_KEY_ID",
-            "AWS_SECRET_ACCESS_KEY": "TEST_SECRET_KEY",
-            "AWS_REGION": "us-east-1",
-            "LOCAL_TEMP_DIR": "/tmp/backupmate",
-            "FULL_BACKUP_PREFIX": "backupmate/full/",
-            "INCREMENTAL_BACKUP_PREFIX": "backupmate/incremental/",
-            "FULL_BACKUP_SCHEDULE": "weekly",
-            "SQLITE_FILE": "/var/lib/backupmate/backupmate.db",
-        }
+        valid_config = {**self._BASELINE, "SQLITE_FILE": "/var/lib/backupmate/backupmate.db"}
         self.assertTrue(config.validate_config(valid_config))
 
     def test_load_config_file_not_found(self):
@@ -94,139 +109,53 @@ class TestConfig(unittest.TestCase):
 
     def test_validate_config_empty_values(self):
         """Tests validation of config with empty values."""
-        empty_config = {
-            "DB_HOST": "",
-            "DB_PORT": "3306",
-            "DB_USER": "",
-            "DB_PASSWORD": "",
-            "MARIADB_BACKUP_PATH": "",
-            "S3_BUCKET_NAME": "",
-            "AWS_ACCESS_KEY_ID": "",
-            "AWS_SECRET_ACCESS_KEY": "",
-            "AWS_REGION": "",
-            "LOCAL_TEMP_DIR": "",
-            "FULL_BACKUP_PREFIX": "",
-            "INCREMENTAL_BACKUP_PREFIX": "",
-            "FULL_BACKUP_SCHEDULE": "",
-        }
+        empty_config = {key: "" for key in self._BASELINE}
+        empty_config["DB_PORT"] = "3306"
         with self.assertRaises(ValueError) as context:
             config.validate_config(empty_config)
         self.assertIn("Missing required configuration parameter:", str(context.exception))
 
     def test_validate_config_schedule_format(self):
         """Tests validation of backup schedule format."""
-        invalid_schedule_config = {
-            "DB_HOST": "localhost",
-            "DB_PORT": "3306",
-            "DB_USER": "testuser",
-            "DB_PASSWORD": "testpassword",
-            "MARIADB_BACKUP_PATH": "/usr/bin/mariabackup",
-            "S3_BUCKET_NAME": "test-bucket",
-            "AWS_ACCESS_KEY_ID": "TEST_KEY_ID",
-            "AWS_SECRET_ACCESS_KEY": "TEST_SECRET_KEY",
-            "AWS_REGION": "us-east-1",
-            "LOCAL_TEMP_DIR": "/tmp/backupmate",
-            "FULL_BACKUP_PREFIX": "backupmate/full/",
-            "INCREMENTAL_BACKUP_PREFIX": "backupmate/incremental/",
-            "FULL_BACKUP_SCHEDULE": "invalid",  # Should be weekly or monthly
-        }
-        with self.assertRaises(ValueError) as context:
-            config.validate_config(invalid_schedule_config)
-        self.assertIn("FULL_BACKUP_SCHEDULE must be either 'weekly' or 'monthly'", str(context.exception))
+        self._assert_invalid([
+            ("FULL_BACKUP_SCHEDULE", "invalid", "FULL_BACKUP_SCHEDULE must be either 'weekly' or 'monthly'"),
+        ])
+
+    def test_validate_config_archive_format(self):
+        """Tests validation of the optional archive format."""
+        for archive_format in ("gz", "zst", None):
+            with self.subTest(archive_format=archive_format):
+                self.assertTrue(config.validate_config({**self._BASELINE, "ARCHIVE_FORMAT": archive_format}))
+        self._assert_invalid([
+            ("ARCHIVE_FORMAT", "bz2", "ARCHIVE_FORMAT must be either 'gz' or 'zst'"),
+        ])
 
     def test_validate_config_s3_paths(self):
         """Tests validation of S3 prefix paths."""
-        invalid_prefix_config = {
-            "DB_HOST": "localhost",
-            "DB_PORT": "3306",
-            "DB_USER": "testuser",
-            "DB_PASSWORD": "testpassword",
-            "MARIADB_BACKUP_PATH": "/usr/bin/mariabackup",
-            "S3_BUCKET_NAME": "test-bucket",
-            "AWS_ACCESS_KEY_ID": "TEST_KEY_ID",
-            "AWS_SECRET_ACCESS_KEY": "TEST_SECRET_KEY",
-            "AWS_REGION": "us-east-1",
-            "LOCAL_TEMP_DIR": "/tmp/backupmate",
-            "FULL_BACKUP_PREFIX": "backupmate/full",  # Missing trailing slash
-            "INCREMENTAL_BACKUP_PREFIX": "backupmate/incremental",  # Missing trailing slash
-            "FULL_BACKUP_SCHEDULE": "weekly",
-        }
-        with self.assertRaises(ValueError) as context:
-            config.validate_config(invalid_prefix_config)
-        self.assertIn("S3 prefix paths must end with '/'", str(context.exception))
+        self._assert_invalid([
+            ("FULL_BACKUP_PREFIX", "backupmate/full", "S3 prefix paths must end with '/'"),
+            ("INCREMENTAL_BACKUP_PREFIX", "backupmate/incremental", "S3 prefix paths must end with '/'"),
+        ])
 
     def test_sqlite_file_default(self):
         """Tests if SQLITE_FILE has correct default value."""
         # Create minimal config without SQLITE_FILE
-        with open(".backupmate.env", "w") as f:
-            f.write("DB_HOST=localhost\n")
-            
-        try:
-            loaded_config = config.load_config()
-            self.assertEqual(loaded_config["SQLITE_FILE"], "backupmate.db")
-        finally:
-            os.remove(".backupmate.env")
+        loaded_config = config.load_config(stream=StringIO("DB_HOST=localhost\n"))
+        self.assertEqual(loaded_config["SQLITE_FILE"], "backupmate.db")
 
     def test_validate_config_local_paths(self):
         """Tests validation of local directory paths."""
-        invalid_path_config = {
-            "DB_HOST": "localhost",
-            "DB_PORT": "3306",
-            "DB_USER": "testuser",
-            "DB_PASSWORD": "testpassword",
-            "MARIADB_BACKUP_PATH": "mariabackup",  # Should be absolute path
-            "S3_BUCKET_NAME": "test-bucket",
-            "AWS_ACCESS_KEY_ID": "TEST_KEY_ID",
-            "AWS_SECRET_ACCESS_KEY": "TEST_SECRET_KEY",
-            "AWS_REGION": "us-east-1",
-            "LOCAL_TEMP_DIR": "tmp/backupmate",  # Should be absolute path
-            "FULL_BACKUP_PREFIX": "backupmate/full/",
-            "INCREMENTAL_BACKUP_PREFIX": "backupmate/incremental/",
-            "FULL_BACKUP_SCHEDULE": "weekly",
-        }
-        with self.assertRaises(ValueError) as context:
-            config.validate_config(invalid_path_config)
-        self.assertIn("must be an absolute path", str(context.exception))
+        self._assert_invalid([
+            ("MARIADB_BACKUP_PATH", "mariabackup", "must be an absolute path"),
+            ("LOCAL_TEMP_DIR", "tmp/backupmate", "must be an absolute path"),
+        ])
 
     def test_validate_config_failure(self):
         """Tests if invalid configuration raises an exception."""
-        invalid_config = {
-            "DB_HOST": "localhost",
-            # Missing DB_PORT
-            "DB_USER": "testuser",
-            "DB_PASSWORD": "testpassword",
-            "MARIADB_BACKUP_PATH": "/usr/bin/mariabackup",
-            "S3_BUCKET_NAME": "test-bucket",
-            "AWS_ACCESS_KEY_ID": "TEST_KEY_ID",
-            "AWS_SECRET_ACCESS_KEY": "TEST_SECRET_KEY",
-            "AWS_REGION": "us-east-1",
-            "LOCAL_TEMP_DIR": "/tmp/backupmate",
-            "FULL_BACKUP_PREFIX": "backupmate/full/",
-            "INCREMENTAL_BACKUP_PREFIX": "backupmate/incremental/",
-            "FULL_BACKUP_SCHEDULE": "weekly",
-        }
-        with self.assertRaises(ValueError) as context:
-            config.validate_config(invalid_config)
-        self.assertIn("Missing required configuration parameter: DB_PORT", str(context.exception))
-
-        invalid_port_config = {
-            "DB_HOST": "localhost",
-            "DB_PORT": "invalid",
-            "DB_USER": "testuser",
-            "DB_PASSWORD": "testpassword",
-            "MARIADB_BACKUP_PATH": "/usr/bin/mariabackup",
-            "S3_BUCKET_NAME": "test-bucket",
-            "AWS_ACCESS_KEY_ID": "TEST_KEY_ID",
-            "AWS_SECRET_ACCESS_KEY": "TEST_SECRET_KEY",
-            "AWS_REGION": "us-east-1",
-            "LOCAL_TEMP_DIR": "/tmp/backupmate",
-            "FULL_BACKUP_PREFIX": "backupmate/full/",
-            "INCREMENTAL_BACKUP_PREFIX": "backupmate/incremental/",
-            "FULL_BACKUP_SCHEDULE": "weekly",
-        }
-        with self.assertRaises(ValueError) as context:
-            config.validate_config(invalid_port_config)
-        self.assertIn("DB_PORT must be an integer", str(context.exception))
+        self._assert_invalid([
+            ("DB_PORT", _MISSING, "Missing required configuration parameter: DB_PORT"),
+            ("DB_PORT", "invalid", "DB_PORT must be an integer"),
+        ])
 
 if __name__ == '__main__':
     unittest.main()
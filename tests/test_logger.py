@@ -1,18 +1,32 @@
 import json
 import logging
 import os
+import shutil
+import sys
 import tempfile
+import time
 import unittest
+from datetime import datetime, timezone
 from unittest.mock import patch, MagicMock
+from logging.handlers import QueueHandler
 
-from backupmate.logger import setup_logger, log_info, log_error, JsonFormatter
+from backupmate.logger import setup_logger, log_info, log_error, JsonFormatter, BufferedFileHandler
 
 class TestLogger(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Create one temporary directory shared by every test's log file."""
+        cls.temp_dir = tempfile.mkdtemp()
+        
+    @classmethod
+    def tearDownClass(cls):
+        """Remove the shared temporary directory."""
+        shutil.rmtree(cls.temp_dir)
+        
     def setUp(self):
         """Set up test fixtures."""
-        # Create a temporary log file for testing
-        self.temp_dir = tempfile.mkdtemp()
-        self.log_file = os.path.join(self.temp_dir, "test.log")
+        # Each test writes its own log file inside the shared directory
+        self.log_file = os.path.join(self.temp_dir, f"{self._testMethodName}.log")
         self.loggers = []  # Track loggers to clean up handlers
         
     def tearDown(self):
@@ -26,7 +40,6 @@ class TestLogger(unittest.TestCase):
         # Clean up temporary files
         if os.path.exists(self.log_file):
             os.remove(self.log_file)
-        os.rmdir(self.temp_dir)
             
     def test_json_formatter(self):
         """Test that the JsonFormatter correctly formats log records."""
@@ -48,6 +61,16 @@ class TestLogger(unittest.TestCase):
         self.assertEqual(log_data["level"], "INFO")
         self.assertEqual(log_data["message"], "Test message")
         
+    def test_json_formatter_timestamp(self):
+        """Test that the timestamp is taken from the record and stays correct across seconds."""
+        formatter = JsonFormatter()
+        record = logging.LogRecord("test", logging.INFO, "test.py", 1, "Test message", (), None)
+        for created in (0.25, 0.5, 86400.125):
+            with self.subTest(created=created):
+                record.created = created
+                expected = datetime.fromtimestamp(created, timezone.utc).replace(tzinfo=None).isoformat(timespec='microseconds')
+                self.assertEqual(json.loads(formatter.format(record))["timestamp"], expected)
+
     def test_json_formatter_with_data(self):
         """Test JSON formatting with additional data."""
         formatter = JsonFormatter()
@@ -67,6 +90,41 @@ class TestLogger(unittest.TestCase):
         
         self.assertEqual(log_data["data"], {"key": "value"})
         
+    def test_json_formatter_caches_exception_text(self):
+        """Test that the traceback is formatted once per record, not once per handler."""
+        formatter = JsonFormatter()
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = logging.LogRecord("test", logging.ERROR, "test.py", 1, "Failed", (), sys.exc_info())
+        with patch.object(formatter, "formatException", wraps=formatter.formatException) as mock_format:
+            first = json.loads(formatter.format(record))
+            second = json.loads(formatter.format(record))
+        mock_format.assert_called_once()
+        self.assertIn("ValueError: boom", first["exception"])
+        self.assertEqual(first["exception"], second["exception"])
+
+    def test_json_formatter_stdlib_fallback(self):
+        """Test JSON formatting when orjson is not installed."""
+        formatter = JsonFormatter()
+        record = logging.LogRecord(
+            name="test",
+            level=logging.INFO,
+            pathname="test.py",
+            lineno=1,
+            msg="Test fallback",
+            args=(),
+            exc_info=None
+        )
+        record.data = {"key": "value"}
+        
+        with patch('backupmate.logger.orjson', None):
+            formatted = formatter.format(record)
+        log_data = json.loads(formatted)
+        
+        self.assertEqual(log_data["message"], "Test fallback")
+        self.assertEqual(log_data["data"], {"key": "value"})
+        
     def test_setup_logger_console(self):
         """Test logger setup with console output only."""
         logger = setup_logger("test_console")
@@ -85,8 +143,76 @@ class TestLogger(unittest.TestCase):
         self.assertEqual(len(logger.handlers), 2)
         self.assertIsInstance(logger.handlers[0], logging.StreamHandler)
         self.assertIsInstance(logger.handlers[1], logging.FileHandler)
+        self.assertIs(logger.handlers[0].formatter, logger.handlers[1].formatter)
         self.assertFalse(logger.propagate, "Logger should not propagate to avoid duplicate logs")
 
+    def test_buffered_file_handler(self):
+        """Test that file writes are buffered until an error, the flush timer, or close."""
+        handler = BufferedFileHandler(self.log_file, flush_interval=3600)
+        handler.setFormatter(JsonFormatter())
+        logger = logging.getLogger("test_buffered")
+        logger.propagate = False
+        logger.handlers = [handler]
+        logger.setLevel(logging.INFO)
+        self.loggers.append(logger)
+        
+        log_info(logger, "Buffered message")
+        with open(self.log_file, 'r') as f:
+            self.assertEqual(f.read(), "")
+        
+        log_error(logger, "Error message", exc_info=False)
+        with open(self.log_file, 'r') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([r["message"] for r in records], ["Buffered message", "Error message"])
+        
+        log_info(logger, "Flushed on close")
+        handler.close()
+        with open(self.log_file, 'r') as f:
+            self.assertEqual(len(f.readlines()), 3)
+
+    def test_buffered_file_handler_timed_flush(self):
+        """Test that a lone info record reaches the file without close()."""
+        handler = BufferedFileHandler(self.log_file, flush_interval=0.05)
+        handler.setFormatter(JsonFormatter())
+        logger = logging.getLogger("test_buffered_timed")
+        logger.propagate = False
+        logger.handlers = [handler]
+        logger.setLevel(logging.INFO)
+        self.loggers.append(logger)
+        
+        log_info(logger, "Before a long command")
+        deadline = time.monotonic() + 5
+        content = ""
+        while not content and time.monotonic() < deadline:
+            time.sleep(0.01)
+            with open(self.log_file, 'r') as f:
+                content = f.read()
+        self.assertEqual(json.loads(content)["message"], "Before a long command")
+
+    def test_setup_logger_queued(self):
+        """Test logger setup that writes records from a background listener."""
+        logger = setup_logger("test_queued", self.log_file, queued=True)
+        self.loggers.append(logger)
+        
+        self.assertEqual(len(logger.handlers), 1)
+        self.assertIsInstance(logger.handlers[0], QueueHandler)
+        
+        log_info(logger, "Queued message", {"key": "value"})
+        try:
+            raise ValueError("Queued error")
+        except ValueError:
+            log_error(logger, "Queued error message")
+        
+        # Closing the queue handler flushes the listener
+        logger.handlers[0].close()
+        
+        with open(self.log_file, 'r') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(records[0]["message"], "Queued message")
+        self.assertEqual(records[0]["data"], {"key": "value"})
+        self.assertEqual(records[1]["level"], "ERROR")
+        self.assertIn("ValueError: Queued error", records[1]["exception"])
+
     def test_setup_logger_clears_existing_handlers(self):
         """Test that setup_logger clears any existing handlers."""
         # Create logger with initial handler
@@ -128,6 +254,21 @@ class TestLogger(unittest.TestCase):
         self.assertEqual(log_data["message"], "Test info message")
         self.assertEqual(log_data["data"], test_data)
         
+    def test_log_info_lazy_data(self):
+        """Test that callable data is only evaluated when the level is enabled."""
+        logger = MagicMock(spec=logging.Logger)
+        data = MagicMock(return_value={"status": "success"})
+        
+        logger.isEnabledFor.return_value = False
+        log_info(logger, "Skipped", data)
+        data.assert_not_called()
+        logger.info.assert_not_called()
+        
+        logger.isEnabledFor.return_value = True
+        log_info(logger, "Logged", data)
+        data.assert_called_once_with()
+        logger.info.assert_called_once_with("Logged", extra={"data": {"status": "success"}})
+
     def test_log_error(self):
         """Test error level logging."""
         from io import StringIO
@@ -1,64 +1,88 @@
 import unittest
 from unittest.mock import patch, call
+import os
+import shutil
 import subprocess
+import sys
+import tempfile
 from backupmate import mariadb
 
 class TestMariadb(unittest.TestCase):
+    def test_run_success(self):
+        with self.assertLogs('backupmate.mariadb', level='INFO') as logs:
+            mariadb._run([sys.executable, '-c', 'print("progress")'])
+        self.assertEqual(logs.records[0].getMessage(), 'progress')
+
     @patch('backupmate.mariadb.subprocess.run')
+    def test_run_without_capture(self, mock_run):
+        mariadb._run(['mariabackup', '--copy-back'], capture=False)
+        mock_run.assert_called_once_with(['mariabackup', '--copy-back'], check=True)
+
+    def test_run_failure_keeps_output_tail(self):
+        script = 'import sys\nfor i in range(200): print(i)\nsys.exit(3)'
+        with self.assertRaises(subprocess.CalledProcessError) as ctx:
+            mariadb._run([sys.executable, '-c', script])
+        self.assertEqual(ctx.exception.returncode, 3)
+        lines = ctx.exception.stdout.decode().split()
+        self.assertEqual(lines, [str(i) for i in range(150, 200)])
+
+    @patch('backupmate.mariadb._run')
     def test_take_full_backup_success(self, mock_run):
-        mock_run.return_value.check_returncode.return_value = None
         config = {'MARIADB_BACKUP_PATH': '/usr/bin/mariabackup', 'DB_HOST': 'localhost', 'DB_PORT': '3306', 'DB_USER': 'test', 'DB_PASSWORD': 'password'}
         result = mariadb.take_full_backup('backup_dir', config)
         self.assertTrue(result)
         mock_run.assert_called_once_with(
-            ['/usr/bin/mariabackup', '--backup', '--target-dir=backup_dir', '--host=localhost', '--port=3306', '--user=test', '--password=password'],
-            check=True,
-            capture_output=True
+            ['/usr/bin/mariabackup', '--backup', '--target-dir=backup_dir', '--host=localhost', '--port=3306', '--user=test', '--password=password']
         )
 
-    @patch('backupmate.mariadb.subprocess.run')
+    @patch('backupmate.mariadb._run')
+    def test_take_full_backup_with_socket(self, mock_run):
+        config = {'MARIADB_BACKUP_PATH': '/usr/bin/mariabackup', 'DB_HOST': 'localhost', 'DB_PORT': '3306', 'DB_USER': 'test', 'DB_PASSWORD': 'password', 'MARIADB_SOCKET': '/tmp/mysql.sock'}
+        result = mariadb.take_full_backup('backup_dir', config)
+        self.assertTrue(result)
+        mock_run.assert_called_once_with(
+            ['/usr/bin/mariabackup', '--backup', '--target-dir=backup_dir', '--host=localhost', '--port=3306', '--user=test', '--password=password', '--socket=/tmp/mysql.sock']
+        )
+
+    @patch('backupmate.mariadb._run')
     def test_take_full_backup_failure_calledprocesserror(self, mock_run):
         mock_run.side_effect = subprocess.CalledProcessError(1, 'command')
         config = {'MARIADB_BACKUP_PATH': '/usr/bin/mariabackup', 'DB_HOST': 'localhost', 'DB_PORT': '3306', 'DB_USER': 'test', 'DB_PASSWORD': 'password'}
         result = mariadb.take_full_backup('backup_dir', config)
         self.assertFalse(result)
 
-    @patch('backupmate.mariadb.subprocess.run')
+    @patch('backupmate.mariadb._run')
     def test_take_full_backup_failure_filenotfounderror(self, mock_run):
         mock_run.side_effect = FileNotFoundError('mariabackup not found')
         config = {'MARIADB_BACKUP_PATH': '/usr/bin/mariabackup', 'DB_HOST': 'localhost', 'DB_PORT': '3306', 'DB_USER': 'test', 'DB_PASSWORD': 'password'}
         result = mariadb.take_full_backup('backup_dir', config)
         self.assertFalse(result)
 
-    @patch('backupmate.mariadb.subprocess.run')
+    @patch('backupmate.mariadb._run')
     def test_take_incremental_backup_success(self, mock_run):
-        mock_run.return_value.check_returncode.return_value = None
         config = {'MARIADB_BACKUP_PATH': '/usr/bin/mariabackup', 'DB_HOST': 'localhost', 'DB_PORT': '3306', 'DB_USER': 'test', 'DB_PASSWORD': 'password'}
         result = mariadb.take_incremental_backup('backup_dir', 'basedir', config)
         self.assertTrue(result)
         mock_run.assert_called_once_with(
-            ['/usr/bin/mariabackup', '--backup', '--target-dir=backup_dir', '--incremental-basedir=basedir', '--host=localhost', '--port=3306', '--user=test', '--password=password'],
-            check=True,
-            capture_output=True
+            ['/usr/bin/mariabackup', '--backup', '--target-dir=backup_dir', '--incremental-basedir=basedir', '--host=localhost', '--port=3306', '--user=test', '--password=password']
         )
 
-    @patch('backupmate.mariadb.subprocess.run')
+    @patch('backupmate.mariadb._run')
     def test_take_incremental_backup_failure_calledprocesserror(self, mock_run):
         mock_run.side_effect = subprocess.CalledProcessError(1, 'command')
         config = {'MARIADB_BACKUP_PATH': '/usr/bin/mariabackup', 'DB_HOST': 'localhost', 'DB_PORT': '3306', 'DB_USER': 'test', 'DB_PASSWORD': 'password'}
         result = mariadb.take_incremental_backup('backup_dir', 'basedir', config)
         self.assertFalse(result)
 
-    @patch('backupmate.mariadb.subprocess.run')
+    @patch('backupmate.mariadb._run')
     def test_take_incremental_backup_failure_filenotfounderror(self, mock_run):
         mock_run.side_effect = FileNotFoundError('mariabackup not found')
         config = {'MARIADB_BACKUP_PATH': '/usr/bin/mariabackup', 'DB_HOST': 'localhost', 'DB_PORT': '3306', 'DB_USER': 'test', 'DB_PASSWORD': 'password'}
         result = mariadb.take_incremental_backup('backup_dir', 'basedir', config)
         self.assertFalse(result)
 
-    @patch('backupmate.mariadb.subprocess.run')
+    @patch('backupmate.mariadb._run')
     def test_prepare_backup_success(self, mock_run):
-        mock_run.return_value.check_returncode.return_value = None
         config = {
             'MARIADB_BACKUP_PATH': '/usr/bin/mariabackup',
             'LOCAL_TEMP_DIR': '/tmp/backups'
@@ -66,14 +90,11 @@ class TestMariadb(unittest.TestCase):
         result = mariadb.prepare_backup('backup_dir', config=config)
         self.assertTrue(result)
         mock_run.assert_called_once_with(
-            ['/usr/bin/mariabackup', '--prepare', '--target-dir=backup_dir'],
-            check=True,
-            capture_output=True
+            ['/usr/bin/mariabackup', '--prepare', '--target-dir=backup_dir']
         )
 
-    @patch('backupmate.mariadb.subprocess.run')
+    @patch('backupmate.mariadb._run')
     def test_prepare_backup_with_incrementals_success(self, mock_run):
-        mock_run.return_value.check_returncode.return_value = None
         config = {
             'MARIADB_BACKUP_PATH': '/usr/bin/mariabackup',
             'LOCAL_TEMP_DIR': '/tmp/backups'
@@ -85,25 +106,42 @@ class TestMariadb(unittest.TestCase):
         expected_calls = [
             # First prepare the base backup
             call(
-                ['/usr/bin/mariabackup', '--prepare', '--target-dir=backup_dir'],
-                check=True,
-                capture_output=True
+                ['/usr/bin/mariabackup', '--prepare', '--target-dir=backup_dir']
             ),
             # Then apply each incremental one at a time
             call(
-                ['/usr/bin/mariabackup', '--prepare', '--target-dir=backup_dir', '--incremental-dir=inc1'],
-                check=True,
-                capture_output=True
+                ['/usr/bin/mariabackup', '--prepare', '--target-dir=backup_dir', '--incremental-dir=inc1']
             ),
             call(
-                ['/usr/bin/mariabackup', '--prepare', '--target-dir=backup_dir', '--incremental-dir=inc2'],
-                check=True,
-                capture_output=True
+                ['/usr/bin/mariabackup', '--prepare', '--target-dir=backup_dir', '--incremental-dir=inc2']
             )
         ]
         mock_run.assert_has_calls(expected_calls)
 
-    @patch('backupmate.mariadb.subprocess.run')
+    @patch('backupmate.mariadb._run')
+    def test_prepare_backup_incremental_uses_latest_full_in_chain(self, mock_run):
+        local_temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, local_temp_dir)
+        chain_dir = os.path.join(local_temp_dir, 'chain')
+        for name in ('full_20230101', 'full_20230108', 'inc_20230109'):
+            os.makedirs(os.path.join(chain_dir, name))
+        # A stray file with a matching name is not a backup directory
+        open(os.path.join(chain_dir, 'full_20230115.tar.gz'), 'w').close()
+        target_dir = os.path.join(local_temp_dir, 'inc_20230109')
+        config = {'MARIADB_BACKUP_PATH': '/usr/bin/mariabackup', 'LOCAL_TEMP_DIR': local_temp_dir}
+
+        with patch('backupmate.mariadb.shutil.copytree') as mock_copytree:
+            result = mariadb.prepare_backup(target_dir, config=config)
+
+        self.assertTrue(result)
+        full_dir = os.path.join(chain_dir, 'full_20230108')
+        mock_run.assert_has_calls([
+            call(['/usr/bin/mariabackup', '--prepare', f'--target-dir={full_dir}']),
+            call(['/usr/bin/mariabackup', '--prepare', f'--target-dir={full_dir}', f'--incremental-dir={target_dir}']),
+        ])
+        mock_copytree.assert_called_once_with(full_dir, target_dir)
+
+    @patch('backupmate.mariadb._run')
     def test_prepare_backup_failure_calledprocesserror(self, mock_run):
         mock_run.side_effect = subprocess.CalledProcessError(1, 'command')
         config = {
@@ -113,7 +151,7 @@ class TestMariadb(unittest.TestCase):
         result = mariadb.prepare_backup('backup_dir', config=config)
         self.assertFalse(result)
 
-    @patch('backupmate.mariadb.subprocess.run')
+    @patch('backupmate.mariadb._run')
     def test_prepare_backup_failure_filenotfounderror(self, mock_run):
         mock_run.side_effect = FileNotFoundError('mariabackup not found')
         config = {'MARIADB_BACKUP_PATH': '/usr/bin/mariabackup'}
@@ -123,9 +161,9 @@ class TestMariadb(unittest.TestCase):
     @patch('backupmate.mariadb.os.path.exists')
     @patch('backupmate.mariadb.shutil.rmtree')
     @patch('backupmate.mariadb.os.makedirs')
-    @patch('backupmate.mariadb.subprocess.run')
-    def test_restore_backup_copy_back_success(self, mock_run, mock_makedirs, mock_rmtree, mock_exists):
-        mock_run.return_value.check_returncode.return_value = None
+    @patch('backupmate.mariadb._set_ownership')
+    @patch('backupmate.mariadb._run')
+    def test_restore_backup_copy_back_success(self, mock_run, mock_set_ownership, mock_makedirs, mock_rmtree, mock_exists):
         mock_exists.return_value = True
         config = {
             'MARIADB_BACKUP_PATH': '/usr/bin/mariabackup',
@@ -140,22 +178,20 @@ class TestMariadb(unittest.TestCase):
         mock_run.assert_any_call(
             ['/usr/bin/mariabackup', '--copy-back', '--target-dir=backup_dir', '--datadir=/var/lib/mysql',
              '--innodb-data-home-dir=/var/lib/mysql/innodb', '--innodb-log-group-home-dir=/var/lib/mysql/innodb'],
-            check=True,
-            capture_output=False
+            capture=False
         )
         
         # Verify ownership setting
-        mock_run.assert_any_call(
-            ['chown', '-R', 'mysql:mysql', '/var/lib/mysql', '/var/lib/mysql/innodb', '/var/lib/mysql/innodb'],
-            check=True
+        mock_set_ownership.assert_called_once_with(
+            ['/var/lib/mysql', '/var/lib/mysql/innodb', '/var/lib/mysql/innodb']
         )
 
     @patch('backupmate.mariadb.os.path.exists')
     @patch('backupmate.mariadb.shutil.rmtree')
     @patch('backupmate.mariadb.os.makedirs')
-    @patch('backupmate.mariadb.subprocess.run')
-    def test_restore_backup_move_back_success(self, mock_run, mock_makedirs, mock_rmtree, mock_exists):
-        mock_run.return_value.check_returncode.return_value = None
+    @patch('backupmate.mariadb._set_ownership')
+    @patch('backupmate.mariadb._run')
+    def test_restore_backup_move_back_success(self, mock_run, mock_set_ownership, mock_makedirs, mock_rmtree, mock_exists):
         mock_exists.return_value = True
         config = {
             'MARIADB_BACKUP_PATH': '/usr/bin/mariabackup',
@@ -164,20 +200,52 @@ class TestMariadb(unittest.TestCase):
         result = mariadb.restore_backup('backup_dir', config, method='move-back')
         self.assertTrue(result)
         
-        expected_calls = [
-            call(
-                ['/usr/bin/mariabackup', '--move-back', '--target-dir=backup_dir', '--datadir=/var/lib/mysql'],
-                check=True,
-                capture_output=False
-            ),
-            call(
-                ['chown', '-R', 'mysql:mysql', '/var/lib/mysql', '/var/lib/mysql', '/var/lib/mysql'],
-                check=True
-            )
-        ]
-        mock_run.assert_has_calls(expected_calls)
+        mock_run.assert_called_once_with(
+            ['/usr/bin/mariabackup', '--move-back', '--target-dir=backup_dir', '--datadir=/var/lib/mysql'],
+            capture=False
+        )
+        mock_set_ownership.assert_called_once_with(['/var/lib/mysql', '/var/lib/mysql', '/var/lib/mysql'])
 
-    @patch('backupmate.mariadb.subprocess.run')
+    @patch('backupmate.mariadb.os.path.exists')
+    @patch('backupmate.mariadb._set_ownership')
+    @patch('backupmate.mariadb._run')
+    def test_restore_backup_chown_failure(self, mock_run, mock_set_ownership, mock_exists):
+        mock_exists.return_value = False
+        for error in (KeyError('mysql'), PermissionError('Operation not permitted')):
+            with self.subTest(error=error):
+                mock_set_ownership.side_effect = error
+                config = {
+                    'MARIADB_BACKUP_PATH': '/usr/bin/mariabackup',
+                    'MARIADB_DATADIR': '/var/lib/mysql'
+                }
+                result = mariadb.restore_backup('backup_dir', config)
+                self.assertFalse(result)
+
+    @patch('backupmate.mariadb.grp.getgrnam')
+    @patch('backupmate.mariadb.pwd.getpwnam')
+    def test_set_ownership(self, mock_getpwnam, mock_getgrnam):
+        mock_getpwnam.return_value.pw_uid = os.getuid()
+        mock_getgrnam.return_value.gr_gid = os.getgid()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        os.makedirs(os.path.join(root, 'db1', 'nested'))
+        for rel in ('ibdata1', os.path.join('db1', 't.ibd'), os.path.join('db1', 'nested', 'x')):
+            open(os.path.join(root, rel), 'w').close()
+        os.symlink('/nonexistent', os.path.join(root, 'db1', 'link'))
+
+        with patch('backupmate.mariadb.os.chown', wraps=os.chown) as mock_chown:
+            mariadb._set_ownership([root, root])
+
+        changed = sorted(os.path.relpath(c.args[0], root) for c in mock_chown.call_args_list)
+        self.assertEqual(changed, sorted([
+            '.', 'ibdata1', 'db1', os.path.join('db1', 't.ibd'), os.path.join('db1', 'link'),
+            os.path.join('db1', 'nested'), os.path.join('db1', 'nested', 'x'),
+        ]))
+        for c in mock_chown.call_args_list:
+            self.assertEqual(c.args[1:], (os.getuid(), os.getgid()))
+            self.assertEqual(c.kwargs, {'follow_symlinks': False})
+
+    @patch('backupmate.mariadb._run')
     def test_restore_backup_failure_calledprocesserror(self, mock_run):
         mock_run.side_effect = subprocess.CalledProcessError(1, 'command')
         config = {
@@ -187,7 +255,7 @@ class TestMariadb(unittest.TestCase):
         result = mariadb.restore_backup('backup_dir', config)
         self.assertFalse(result)
 
-    @patch('backupmate.mariadb.subprocess.run')
+    @patch('backupmate.mariadb._run')
     def test_restore_backup_failure_filenotfounderror(self, mock_run):
         mock_run.side_effect = FileNotFoundError('mariabackup not found')
         config = {
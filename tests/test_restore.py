@@ -1,5 +1,5 @@
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, DEFAULT
 import subprocess
 import os
 from backupmate import restore
@@ -24,7 +24,7 @@ class TestRestore(unittest.TestCase):
     @patch('backupmate.mariadb.restore_backup')
     def test_restore_specific_backup_success(self, mock_restore_backup, mock_start_server, 
                                           mock_stop_server, mock_download_prepare):
-        """Tests successful backup restoration."""
+        """Tests successful backup restoration with each restore method."""
         # Configure mocks
         prepared_folder = "/tmp/test_restore/temp/backup"
         mock_download_prepare.return_value = prepared_folder
@@ -32,24 +32,31 @@ class TestRestore(unittest.TestCase):
         mock_restore_backup.return_value = True
         mock_start_server.return_value = True
 
-        # Test
-        result = restore.restore_specific_backup(self.backup_prefix, 'copy-back', self.config)
+        for method in ('copy-back', 'move-back'):
+            with self.subTest(method=method):
+                for mock in (mock_download_prepare, mock_stop_server, mock_restore_backup, mock_start_server):
+                    mock.reset_mock()
 
-        # Verify
-        self.assertTrue(result)
-        mock_download_prepare.assert_called_once_with(self.backup_prefix, 
-                                                    self.config['LOCAL_TEMP_DIR'], 
-                                                    self.config)
-        mock_stop_server.assert_called_once()
-        mock_restore_backup.assert_called_once_with(prepared_folder, 
-                                                  self.config, 
-                                                  method='copy-back')
-        mock_start_server.assert_called_once()
-
-    def test_restore_specific_backup_invalid_method(self):
+                # Test
+                result = restore.restore_specific_backup(self.backup_prefix, method, self.config)
+
+                # Verify
+                self.assertTrue(result)
+                mock_download_prepare.assert_called_once_with(self.backup_prefix, 
+                                                            self.config['LOCAL_TEMP_DIR'], 
+                                                            self.config)
+                mock_stop_server.assert_called_once_with(self.config)
+                mock_restore_backup.assert_called_once_with(prepared_folder, 
+                                                          self.config, 
+                                                          method=method)
+                mock_start_server.assert_called_once_with(self.config)
+
+    @patch('backupmate.restore.download_and_prepare_backup')
+    def test_restore_specific_backup_invalid_method(self, mock_download_prepare):
         """Tests restoration with invalid restore method."""
         result = restore.restore_specific_backup(self.backup_prefix, 'invalid-method', self.config)
         self.assertFalse(result)
+        mock_download_prepare.assert_not_called()
 
     @patch('backupmate.restore.download_and_prepare_backup')
     @patch('backupmate.restore.stop_mariadb_server')
@@ -65,87 +72,6 @@ class TestRestore(unittest.TestCase):
         mock_stop_server.assert_not_called()
         mock_start_server.assert_not_called()
 
-    @patch('backupmate.s3.download_file')
-    @patch('backupmate.mariadb.prepare_backup')
-    @patch('backupmate.utils.decompress_archive')
-    @patch('os.makedirs')
-    @patch('os.path.exists')
-    @patch('os.path.join')
-    def test_download_and_prepare_backup_success(self, mock_join, mock_exists, mock_makedirs, 
-                                               mock_decompress, mock_prepare_backup, mock_download):
-        """Tests successful backup download and preparation."""
-        # Configure mocks
-        mock_download.return_value = True
-        mock_exists.return_value = True
-        mock_decompress.return_value = "/tmp/test_restore/temp/backup"
-        mock_prepare_backup.return_value = True
-        mock_join.side_effect = lambda *args: '/'.join(args)
-
-        result = restore.download_and_prepare_backup(self.backup_prefix, 
-                                                   self.config['LOCAL_TEMP_DIR'], 
-                                                   self.config)
-
-        self.assertEqual(result, "/tmp/test_restore/temp/backup")
-        # Verify temp directory creation
-        mock_makedirs.assert_any_call('/tmp/test_restore/temp', exist_ok=True)
-        # Verify download to temp directory
-        mock_download.assert_called_once_with(self.config['S3_BUCKET_NAME'], 
-                                            self.backup_prefix,
-                                            '/tmp/test_restore/temp/01', 
-                                            self.config)
-        # Verify archive extraction
-        mock_decompress.assert_called_once()
-        # Verify backup preparation on extracted directory
-        mock_prepare_backup.assert_called_once()
-
-    @patch('backupmate.s3.download_file')
-    @patch('os.makedirs')
-    def test_download_and_prepare_backup_download_failure(self, mock_makedirs, mock_download):
-        """Tests handling of S3 download failure."""
-        mock_download.return_value = False
-
-        result = restore.download_and_prepare_backup(self.backup_prefix, 
-                                                   self.config['LOCAL_TEMP_DIR'], 
-                                                   self.config)
-
-        self.assertFalse(result)
-        expected_temp_dir = os.path.join('/tmp/test_restore', 'temp')
-        mock_makedirs.assert_called_once_with(expected_temp_dir, exist_ok=True)
-
-    @patch('backupmate.s3.download_file')
-    @patch('backupmate.utils.decompress_archive')
-    @patch('os.makedirs')
-    @patch('os.path.exists')
-    def test_download_and_prepare_backup_no_tarfile(self, mock_exists, mock_makedirs, 
-                                                  mock_decompress, mock_download):
-        """Tests handling of missing tar.gz file."""
-        mock_download.return_value = True
-        mock_exists.return_value = False
-
-        result = restore.download_and_prepare_backup(self.backup_prefix, 
-                                                   self.config['LOCAL_TEMP_DIR'], 
-                                                   self.config)
-
-        self.assertFalse(result)
-        mock_decompress.assert_not_called()
-
-    @patch('backupmate.s3.download_file')
-    @patch('backupmate.utils.decompress_archive')
-    @patch('os.makedirs')
-    @patch('os.path.exists')
-    def test_download_and_prepare_backup_extraction_failure(self, mock_exists, mock_makedirs, 
-                                                          mock_decompress, mock_download):
-        """Tests handling of archive extraction failure."""
-        mock_download.return_value = True
-        mock_exists.return_value = True
-        mock_decompress.return_value = False
-
-        result = restore.download_and_prepare_backup(self.backup_prefix, 
-                                                   self.config['LOCAL_TEMP_DIR'], 
-                                                   self.config)
-
-        self.assertFalse(result)
-
     @patch('subprocess.run')
     @patch('backupmate.config.load_config')
     def test_stop_mariadb_server_custom_command_success(self, mock_load_config, mock_run):
@@ -160,6 +86,18 @@ class TestRestore(unittest.TestCase):
                                        shell=True, 
                                        check=True)
 
+    @patch('subprocess.run')
+    @patch('backupmate.config.load_config')
+    def test_server_commands_use_given_config(self, mock_load_config, mock_run):
+        """Tests that a passed-in config is used instead of reloading the .env file."""
+        config = {'MYSQL_STOP_COMMAND': 'stop-db', 'MYSQL_START_COMMAND': 'start-db'}
+
+        self.assertTrue(restore.stop_mariadb_server(config))
+        self.assertTrue(restore.start_mariadb_server(config))
+
+        mock_load_config.assert_not_called()
+        self.assertEqual([c.args[0] for c in mock_run.call_args_list], [('stop-db',), ('start-db',)])
+
     @patch('subprocess.run')
     @patch('backupmate.config.load_config')
     def test_stop_mariadb_server_systemctl_success(self, mock_load_config, mock_run):
@@ -172,7 +110,8 @@ class TestRestore(unittest.TestCase):
         self.assertTrue(result)
         mock_run.assert_called_once_with(['systemctl', 'stop', 'mariadb'], 
                                        check=True, 
-                                       capture_output=True)
+                                       stdout=subprocess.DEVNULL,
+                                       stderr=subprocess.PIPE)
 
     @patch('subprocess.run')
     @patch('backupmate.config.load_config')
@@ -195,10 +134,24 @@ class TestRestore(unittest.TestCase):
         result = restore.start_mariadb_server()
         
         self.assertTrue(result)
-        mock_run.assert_called_once_with('mysqld --datadir=/var/lib/mysql', 
-                                       shell=True, 
+        mock_run.assert_called_once_with(('mysqld', '--datadir=/var/lib/mysql'), 
+                                       shell=False, 
                                        check=True)
 
+    def test_command_args(self):
+        """Tests that only commands needing a shell are run through one."""
+        cases = {
+            'systemctl stop mariadb': (('systemctl', 'stop', 'mariadb'), False),
+            "mysqladmin --defaults-file='/etc/my cnf' shutdown": (('mysqladmin', '--defaults-file=/etc/my cnf', 'shutdown'), False),
+            'kill -9 $(cat /var/run/mysql.pid)': ('kill -9 $(cat /var/run/mysql.pid)', True),
+            'service mariadb stop && sleep 1': ('service mariadb stop && sleep 1', True),
+            'MYSQL_HOME=/etc/mysql mysqld_safe': ('MYSQL_HOME=/etc/mysql mysqld_safe', True),
+            'systemctl stop mariadb # graceful': ('systemctl stop mariadb # graceful', True),
+        }
+        for command, expected in cases.items():
+            with self.subTest(command=command):
+                self.assertEqual(restore._command_args(command), expected)
+
     @patch('subprocess.run')
     @patch('backupmate.config.load_config')
     def test_start_mariadb_server_systemctl_success(self, mock_load_config, mock_run):
@@ -211,7 +164,8 @@ class TestRestore(unittest.TestCase):
         self.assertTrue(result)
         mock_run.assert_called_once_with(['systemctl', 'start', 'mariadb'], 
                                        check=True, 
-                                       capture_output=True)
+                                       stdout=subprocess.DEVNULL,
+                                       stderr=subprocess.PIPE)
 
     @patch('subprocess.run')
     @patch('backupmate.config.load_config')
@@ -224,5 +178,108 @@ class TestRestore(unittest.TestCase):
         
         self.assertFalse(result)
 
+class TestDownloadAndPrepareBackup(unittest.TestCase):
+    def setUp(self):
+        """Patch the S3, extraction and prepare steps once for every test."""
+        self.config = {
+            'S3_BUCKET_NAME': 'test-bucket',
+            'LOCAL_TEMP_DIR': '/tmp/test_restore',
+            'MARIADB_BACKUP_PATH': '/usr/bin/mariabackup',
+            'IS_TEST': True
+        }
+        self.backup_prefix = 'backups/2023/01/01/'
+        patchers = [
+            patch.multiple('backupmate.s3', download_file=DEFAULT, open_object_stream=DEFAULT),
+            patch.multiple('backupmate.utils', decompress_archive=DEFAULT, extract_archive_stream=DEFAULT),
+            patch.multiple('backupmate.mariadb', prepare_backup=DEFAULT),
+            patch.multiple('os', makedirs=DEFAULT),
+            patch.multiple('os.path', exists=DEFAULT),
+        ]
+        self.mocks = {}
+        for patcher in patchers:
+            self.mocks.update(patcher.start())
+            self.addCleanup(patcher.stop)
+        # Default to the happy path, tests override the step they exercise
+        self.mocks['download_file'].return_value = True
+        self.mocks['exists'].return_value = True
+        self.mocks['decompress_archive'].return_value = "/tmp/test_restore/temp/backup"
+        self.mocks['prepare_backup'].return_value = True
+
+    def _download_and_prepare(self, backup_prefix=None, **overrides):
+        config = {**self.config, **overrides}
+        return restore.download_and_prepare_backup(backup_prefix or self.backup_prefix,
+                                                   config['LOCAL_TEMP_DIR'],
+                                                   config)
+
+    def test_download_and_prepare_backup_success(self):
+        """Tests successful backup download and preparation."""
+        result = self._download_and_prepare()
+
+        self.assertEqual(result, "/tmp/test_restore/temp/backup")
+        # Verify temp directory creation
+        self.mocks['makedirs'].assert_any_call('/tmp/test_restore/temp', exist_ok=True)
+        # Verify download to temp directory
+        self.mocks['download_file'].assert_called_once_with(self.config['S3_BUCKET_NAME'],
+                                                            self.backup_prefix,
+                                                            '/tmp/test_restore/temp/01',
+                                                            self.config)
+        # Verify archive extraction
+        self.mocks['decompress_archive'].assert_called_once()
+        # Verify backup preparation on extracted directory
+        self.mocks['prepare_backup'].assert_called_once()
+
+    def test_download_and_prepare_backup_stream_extract(self):
+        """Tests restoring by extracting straight from the S3 object stream."""
+        backup_prefix = 'backupmate/full/full_20230101.tar.gz'
+        mock_body = self.mocks['open_object_stream'].return_value
+        self.mocks['extract_archive_stream'].return_value = '/tmp/test_restore/extracted/full_20230101'
+
+        result = self._download_and_prepare(backup_prefix, STREAM_EXTRACT=True)
+
+        self.assertEqual(result, '/tmp/test_restore/extracted/full_20230101')
+        self.mocks['open_object_stream'].assert_called_once_with(
+            'test-bucket', backup_prefix, {**self.config, 'STREAM_EXTRACT': True})
+        self.mocks['extract_archive_stream'].assert_called_once_with(
+            mock_body, '/tmp/test_restore/extracted', 'full_20230101.tar.gz')
+        mock_body.close.assert_called_once()
+        self.mocks['download_file'].assert_not_called()
+
+    def test_download_and_prepare_backup_stream_open_failure(self):
+        """Tests handling of a backup stream that cannot be opened."""
+        self.mocks['open_object_stream'].return_value = None
+
+        result = self._download_and_prepare(STREAM_EXTRACT=True)
+
+        self.assertFalse(result)
+        self.mocks['extract_archive_stream'].assert_not_called()
+
+    def test_download_and_prepare_backup_download_failure(self):
+        """Tests handling of S3 download failure."""
+        self.mocks['download_file'].return_value = False
+
+        result = self._download_and_prepare()
+
+        self.assertFalse(result)
+        expected_temp_dir = os.path.join('/tmp/test_restore', 'temp')
+        self.mocks['makedirs'].assert_called_once_with(expected_temp_dir, exist_ok=True)
+
+    def test_download_and_prepare_backup_no_tarfile(self):
+        """Tests handling of missing tar.gz file."""
+        self.mocks['exists'].return_value = False
+
+        result = self._download_and_prepare()
+
+        self.assertFalse(result)
+        self.mocks['decompress_archive'].assert_not_called()
+
+    def test_download_and_prepare_backup_extraction_failure(self):
+        """Tests handling of archive extraction failure."""
+        self.mocks['decompress_archive'].return_value = False
+
+        result = self._download_and_prepare()
+
+        self.assertFalse(result)
+        self.mocks['prepare_backup'].assert_not_called()
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,8 @@
 import unittest
-from unittest.mock import patch, MagicMock, mock_open
+from unittest.mock import patch, MagicMock, mock_open, ANY
 import os
+import tempfile
+from datetime import datetime
 from botocore.exceptions import ClientError
 from backupmate import s3
 
@@ -14,18 +16,22 @@ class TestS3(unittest.TestCase):
         self.s3_bucket = 'test-bucket'
         self.s3_prefix = 'backups/'
         self.local_path = '/tmp/backups'
+        # Each test patches boto3.client, so start without cached clients
+        s3._clients.clear()
+        self.addCleanup(s3._clients.clear)
 
     @patch('backupmate.s3.boto3.client')
-    @patch('backupmate.s3.os.walk')
+    @patch('backupmate.s3._iter_files')
     @patch('backupmate.s3.os.path.exists')
-    def test_upload_directory_success(self, mock_exists, mock_walk, mock_boto3_client):
+    def test_upload_directory_success(self, mock_exists, mock_iter_files, mock_boto3_client):
         """Tests successful S3 directory upload."""
         # Setup mocks
         mock_exists.return_value = True
-        mock_walk.return_value = [
-            ('/tmp/backups', [], ['file1.txt', 'file2.txt']),
-            ('/tmp/backups/subdir', [], ['file3.txt'])
-        ]
+        mock_iter_files.return_value = iter([
+            ('/tmp/backups/file1.txt', 'file1.txt'),
+            ('/tmp/backups/file2.txt', 'file2.txt'),
+            ('/tmp/backups/subdir/file3.txt', 'subdir/file3.txt')
+        ])
         mock_s3 = MagicMock()
         mock_boto3_client.return_value = mock_s3
 
@@ -35,13 +41,49 @@ class TestS3(unittest.TestCase):
         # Verify
         self.assertTrue(result)
         self.assertEqual(mock_s3.upload_file.call_count, 3)
+        self.assertEqual(
+            sorted(c.args[2] for c in mock_s3.upload_file.call_args_list),
+            ['backups/file1.txt', 'backups/file2.txt', 'backups/subdir/file3.txt']
+        )
         mock_boto3_client.assert_called_once_with(
             's3',
             aws_access_key_id='test_key',
             aws_secret_access_key='test_secret',
-            region_name='us-east-1'
+            region_name='us-east-1',
+            config=ANY
         )
 
+    def test_iter_files(self):
+        """Tests walking a real tree into file paths and '/'-separated relative paths."""
+        with tempfile.TemporaryDirectory() as root:
+            os.makedirs(os.path.join(root, 'db', 'nested'))
+            for name in ('ibdata1', os.path.join('db', 't.ibd'), os.path.join('db', 'nested', 'x')):
+                with open(os.path.join(root, name), 'w'):
+                    pass
+            os.symlink(os.path.join(root, 'db'), os.path.join(root, 'db_link'))
+
+            result = sorted(s3._iter_files(root))
+
+        self.assertEqual(result, [
+            (os.path.join(root, 'db', 'nested', 'x'), 'db/nested/x'),
+            (os.path.join(root, 'db', 't.ibd'), 'db/t.ibd'),
+            (os.path.join(root, 'ibdata1'), 'ibdata1')
+        ])
+
+    @patch('backupmate.s3.boto3.client')
+    @patch('backupmate.s3._iter_files')
+    @patch('backupmate.s3.os.path.exists')
+    def test_upload_directory_key_prefix(self, mock_exists, mock_iter_files, mock_boto3_client):
+        """Tests that keys get exactly one separator after the prefix, or none without a prefix."""
+        mock_exists.return_value = True
+        mock_s3 = MagicMock()
+        mock_boto3_client.return_value = mock_s3
+        for prefix, expected in (('backups', 'backups/db/t.ibd'), ('backups/', 'backups/db/t.ibd'), ('', 'db/t.ibd')):
+            with self.subTest(prefix=prefix):
+                mock_iter_files.return_value = iter([('/tmp/backups/db/t.ibd', 'db/t.ibd')])
+                self.assertTrue(s3.upload_directory(self.local_path, self.s3_bucket, prefix, self.config))
+                self.assertEqual(mock_s3.upload_file.call_args.args[2], expected)
+
     @patch('backupmate.s3.boto3.client')
     @patch('backupmate.s3.os.path.exists')
     def test_upload_directory_nonexistent_dir(self, mock_exists, mock_boto3_client):
@@ -52,14 +94,14 @@ class TestS3(unittest.TestCase):
         mock_boto3_client.assert_not_called()
 
     @patch('backupmate.s3.boto3.client')
-    @patch('backupmate.s3.os.walk')
+    @patch('backupmate.s3._iter_files')
     @patch('backupmate.s3.os.path.exists')
-    def test_upload_directory_client_error(self, mock_exists, mock_walk, mock_boto3_client):
+    def test_upload_directory_client_error(self, mock_exists, mock_iter_files, mock_boto3_client):
         """Tests error handling during S3 upload."""
         mock_exists.return_value = True
-        mock_walk.return_value = [
-            ('/tmp/backups', [], ['file1.txt'])
-        ]
+        mock_iter_files.return_value = iter([
+            ('/tmp/backups/file1.txt', 'file1.txt')
+        ])
         mock_s3 = MagicMock()
         mock_s3.upload_file.side_effect = ClientError(
             {'Error': {'Code': 'TestException', 'Message': 'Test error'}},
@@ -70,6 +112,31 @@ class TestS3(unittest.TestCase):
         result = s3.upload_directory(self.local_path, self.s3_bucket, self.s3_prefix, self.config)
         self.assertFalse(result)
 
+    @patch('backupmate.s3.boto3.client')
+    @patch('backupmate.s3._iter_files')
+    @patch('backupmate.s3.os.path.exists')
+    def test_upload_directory_parallel(self, mock_exists, mock_iter_files, mock_boto3_client):
+        """Tests that files are uploaded on S3_PREFIX_PARALLELISM workers and one failure fails the upload."""
+        mock_exists.return_value = True
+        mock_iter_files.return_value = iter([
+            (f'/tmp/backups/{name}', name) for name in ('file1.txt', 'file2.txt', 'file3.txt')
+        ])
+        def upload_file(path, *args, **kwargs):
+            if path == '/tmp/backups/file2.txt':
+                raise ClientError({'Error': {'Code': 'TestException', 'Message': 'Test error'}}, 'upload_file')
+        mock_s3 = MagicMock()
+        mock_s3.upload_file.side_effect = upload_file
+        mock_boto3_client.return_value = mock_s3
+        config = {**self.config, 'S3_PREFIX_PARALLELISM': '8'}
+
+        with patch('backupmate.s3.ThreadPoolExecutor', wraps=s3.ThreadPoolExecutor) as mock_executor:
+            result = s3.upload_directory(self.local_path, self.s3_bucket, self.s3_prefix, config)
+
+        self.assertFalse(result)
+        mock_executor.assert_called_once_with(max_workers=8)
+        uploaded_keys = sorted(c.args[2] for c in mock_s3.upload_file.call_args_list)
+        self.assertEqual(uploaded_keys, ['backups/file1.txt', 'backups/file2.txt', 'backups/file3.txt'])
+
     @patch('backupmate.s3.boto3.client')
     @patch('backupmate.s3.os.makedirs')
     def test_download_directory_success(self, mock_makedirs, mock_boto3_client):
@@ -92,6 +159,156 @@ class TestS3(unittest.TestCase):
         self.assertEqual(mock_s3.download_file.call_count, 2)
         mock_makedirs.assert_called()
 
+    @patch('backupmate.s3.boto3.client')
+    @patch('backupmate.s3.os.makedirs')
+    def test_download_directory_creates_each_dir_once(self, mock_makedirs, mock_boto3_client):
+        """Tests that each local directory is created once however many objects it holds."""
+        mock_s3 = MagicMock()
+        mock_s3.get_paginator.return_value.paginate.return_value = [
+            {'Contents': [{'Key': 'backups/file1.txt'}, {'Key': 'backups/subdir/file2.txt'}]},
+            {'Contents': [{'Key': 'backups/subdir/file3.txt'}, {'Key': 'backups/file4.txt'}]}
+        ]
+        mock_boto3_client.return_value = mock_s3
+
+        result = s3.download_directory(self.s3_bucket, self.s3_prefix, self.local_path, self.config)
+
+        self.assertTrue(result)
+        self.assertEqual(mock_s3.download_file.call_count, 4)
+        self.assertEqual(
+            [c.args[0] for c in mock_makedirs.call_args_list],
+            ['/tmp/backups', '/tmp/backups/subdir']
+        )
+
+    @patch('backupmate.s3.boto3.client')
+    @patch('backupmate.s3.os.makedirs')
+    def test_download_directory_prefix_trailing_slash(self, mock_makedirs, mock_boto3_client):
+        """Tests that a directory prefix is listed with a trailing '/' so sibling prefixes are excluded."""
+        mock_s3 = MagicMock()
+        mock_s3.get_paginator.return_value.paginate.return_value = [{
+            'Contents': [{'Key': 'backups/file1.txt'}]
+        }]
+        mock_boto3_client.return_value = mock_s3
+
+        result = s3.download_directory(self.s3_bucket, 'backups', self.local_path, self.config)
+
+        self.assertTrue(result)
+        mock_s3.get_paginator.return_value.paginate.assert_called_once_with(
+            Bucket=self.s3_bucket, Prefix='backups/'
+        )
+        self.assertEqual(mock_s3.download_file.call_args.args[2], '/tmp/backups/file1.txt')
+
+    @patch('backupmate.s3.boto3.client')
+    @patch('backupmate.s3.os.makedirs')
+    def test_download_directory_download_error(self, mock_makedirs, mock_boto3_client):
+        """Tests that a failed object download fails the whole directory download."""
+        mock_s3 = MagicMock()
+        mock_s3.get_paginator.return_value.paginate.return_value = [{
+            'Contents': [
+                {'Key': 'backups/file1.txt'},
+                {'Key': 'backups/file2.txt'}
+            ]
+        }]
+        mock_s3.download_file.side_effect = [None, ClientError(
+            {'Error': {'Code': 'NoSuchKey', 'Message': 'Not found'}},
+            'GetObject'
+        )]
+        mock_boto3_client.return_value = mock_s3
+
+        result = s3.download_directory(self.s3_bucket, self.s3_prefix, self.local_path, self.config)
+        self.assertFalse(result)
+        self.assertEqual(mock_s3.download_file.call_count, 2)
+
+    @patch('backupmate.s3.boto3.client')
+    @patch('backupmate.s3.os.makedirs')
+    def test_download_file_transfer_config(self, mock_makedirs, mock_boto3_client):
+        """Tests that downloads use the multipart transfer settings."""
+        mock_s3 = MagicMock()
+        mock_boto3_client.return_value = mock_s3
+        config = {**self.config, 'S3_MAX_CONCURRENCY': '20'}
+
+        result = s3.download_file(self.s3_bucket, 'backups/full.tar.gz', '/tmp/backups/full.tar.gz', config)
+
+        self.assertTrue(result)
+        transfer_config = mock_s3.download_file.call_args.kwargs['Config']
+        self.assertEqual(transfer_config.max_request_concurrency, 20)
+        self.assertEqual(transfer_config.multipart_chunksize, 16 * 1024 * 1024)
+
+    @patch('backupmate.s3.boto3.client')
+    @patch('backupmate.s3.os.path.exists')
+    def test_upload_file_transfer_config(self, mock_exists, mock_boto3_client):
+        """Tests that uploads use the multipart transfer settings."""
+        mock_exists.return_value = True
+        mock_s3 = MagicMock()
+        mock_boto3_client.return_value = mock_s3
+
+        result = s3.upload_file('/tmp/backups/full.tar.gz', self.s3_bucket, 'backups/', self.config)
+
+        self.assertTrue(result)
+        mock_s3.upload_file.assert_called_once_with(
+            '/tmp/backups/full.tar.gz', self.s3_bucket, 'backups/full.tar.gz', Config=ANY
+        )
+        transfer_config = mock_s3.upload_file.call_args.kwargs['Config']
+        self.assertEqual(transfer_config.multipart_threshold, 8 * 1024 * 1024)
+        self.assertEqual(transfer_config.max_request_concurrency, s3._DEFAULT_MAX_CONCURRENCY)
+
+    @patch('backupmate.s3.boto3.client')
+    def test_upload_stream(self, mock_boto3_client):
+        """Tests uploading a stream with the multipart transfer settings, and the error path."""
+        mock_s3 = MagicMock()
+        mock_boto3_client.return_value = mock_s3
+        stream = MagicMock()
+
+        self.assertTrue(s3.upload_stream(stream, self.s3_bucket, 'backups/full.tar.gz', self.config))
+        mock_s3.upload_fileobj.assert_called_once_with(stream, self.s3_bucket, 'backups/full.tar.gz', Config=ANY)
+
+        mock_s3.upload_fileobj.side_effect = ClientError(
+            {'Error': {'Code': 'AccessDenied', 'Message': 'Denied'}},
+            'PutObject'
+        )
+        self.assertFalse(s3.upload_stream(stream, self.s3_bucket, 'backups/full.tar.gz', self.config))
+
+    @patch('backupmate.s3.boto3.client')
+    def test_client_reused_per_credentials(self, mock_boto3_client):
+        """Tests that one client is built per credential set and then reused."""
+        mock_boto3_client.side_effect = lambda *args, **kwargs: MagicMock()
+        other_region = {**self.config, 'AWS_REGION': 'eu-west-1'}
+
+        first = s3._get_s3_client(self.config)
+        self.assertIs(s3._get_s3_client(dict(self.config)), first)
+        self.assertIsNot(s3._get_s3_client(other_region), first)
+        self.assertEqual(mock_boto3_client.call_count, 2)
+        client_config = mock_boto3_client.call_args.kwargs['config']
+        self.assertEqual(client_config.retries, {'max_attempts': 10, 'mode': 'adaptive'})
+        self.assertEqual(client_config.max_pool_connections, 40)
+        self.assertTrue(client_config.tcp_keepalive)
+
+    @patch('backupmate.s3.boto3.client')
+    def test_client_pool_sized_to_workers(self, mock_boto3_client):
+        """Tests that the connection pool covers every worker's parallel part requests."""
+        mock_boto3_client.side_effect = lambda *args, **kwargs: MagicMock()
+        tuned = {**self.config, 'S3_MAX_CONCURRENCY': '20', 'S3_PREFIX_PARALLELISM': '8'}
+
+        self.assertIsNot(s3._get_s3_client(tuned), s3._get_s3_client(self.config))
+        pool_sizes = [c.kwargs['config'].max_pool_connections for c in mock_boto3_client.call_args_list]
+        self.assertEqual(pool_sizes, [160, 40])
+
+    @patch('backupmate.s3.boto3.client')
+    def test_open_object_stream(self, mock_boto3_client):
+        """Tests opening an object body for streaming, and the error path."""
+        mock_s3 = MagicMock()
+        mock_body = MagicMock()
+        mock_s3.get_object.return_value = {'Body': mock_body}
+        mock_boto3_client.return_value = mock_s3
+
+        self.assertIs(s3.open_object_stream(self.s3_bucket, 'backups/full.tar.gz', self.config), mock_body)
+        mock_s3.get_object.assert_called_once_with(Bucket=self.s3_bucket, Key='backups/full.tar.gz')
+
+        mock_s3.get_object.side_effect = ClientError(
+            {'Error': {'Code': 'NoSuchKey', 'Message': 'Not found'}},
+            'GetObject'
+        )
+        self.assertIsNone(s3.open_object_stream(self.s3_bucket, 'backups/full.tar.gz', self.config))
+
     @patch('backupmate.s3.boto3.client')
     def test_download_directory_client_error(self, mock_boto3_client):
         """Tests error handling during S3 download."""
@@ -136,30 +353,75 @@ class TestS3(unittest.TestCase):
         result = s3.list_objects(self.s3_bucket, self.s3_prefix, self.config)
         self.assertEqual(result, [])
 
-    @patch('backupmate.s3.list_objects')
-    def test_get_latest_backup_prefix_success(self, mock_list_objects):
+    @patch('backupmate.s3.boto3.client')
+    def test_list_object_summaries_success(self, mock_boto3_client):
+        """Tests listing objects with metadata taken from the LIST response."""
+        mock_s3 = MagicMock()
+        modified = datetime(2023, 1, 1)
+        mock_s3.get_paginator.return_value.paginate.return_value = [{
+            'Contents': [
+                {'Key': 'backups/file1.txt', 'LastModified': modified, 'Size': 10, 'ETag': '"abc"'}
+            ]
+        }]
+        mock_boto3_client.return_value = mock_s3
+
+        result = s3.list_object_summaries(self.s3_bucket, self.s3_prefix, self.config)
+
+        self.assertEqual(result, [{'Key': 'backups/file1.txt', 'LastModified': modified, 'Size': 10}])
+        mock_s3.head_object.assert_not_called()
+
+    @patch('backupmate.s3.boto3.client')
+    def test_list_object_summaries_client_error(self, mock_boto3_client):
+        """Tests that a failed LIST is logged and returns an empty list."""
+        mock_s3 = MagicMock()
+        mock_s3.get_paginator.return_value.paginate.side_effect = ClientError(
+            {'Error': {'Code': 'TestException', 'Message': 'Test error'}},
+            'list_objects_v2'
+        )
+        mock_boto3_client.return_value = mock_s3
+
+        for list_function in (s3.list_objects, s3.list_object_summaries):
+            with self.subTest(list_function=list_function.__name__):
+                self.assertEqual(list_function(self.s3_bucket, self.s3_prefix, self.config), [])
+
+    @patch('backupmate.s3.boto3.client')
+    def test_get_latest_backup_prefix_across_pages(self, mock_boto3_client):
+        """Tests that the latest key is found across LIST pages, including empty ones."""
+        mock_s3 = MagicMock()
+        mock_s3.get_paginator.return_value.paginate.return_value = iter([
+            {'Contents': [{'Key': f'backups/2023-01-{day:02d}/full.tar.gz'} for day in (3, 9, 1)]},
+            {},
+            {'Contents': [{'Key': 'backups/2023-01-05/full.tar.gz'}]}
+        ])
+        mock_boto3_client.return_value = mock_s3
+
+        result = s3.get_latest_backup_prefix(self.s3_bucket, self.s3_prefix, self.config)
+        self.assertEqual(result, 'backups/2023-01-09/full.tar.gz')
+
+    @patch('backupmate.s3._iter_keys')
+    def test_get_latest_backup_prefix_success(self, mock_iter_keys):
         """Tests retrieving the latest backup prefix from S3."""
-        mock_list_objects.return_value = [
-            'backups/2023-01-01/backup1.tar.gz',
+        mock_iter_keys.return_value = iter([
             'backups/2023-01-02/backup2.tar.gz',
-            'backups/2023-01-03/backup3.tar.gz'
-        ]
+            'backups/2023-01-03/backup3.tar.gz',
+            'backups/2023-01-01/backup1.tar.gz'
+        ])
 
         result = s3.get_latest_backup_prefix(self.s3_bucket, self.s3_prefix, self.config)
         self.assertEqual(result, 'backups/2023-01-03/backup3.tar.gz')
 
-    @patch('backupmate.s3.list_objects')
-    def test_get_latest_backup_prefix_no_backups(self, mock_list_objects):
+    @patch('backupmate.s3._iter_keys')
+    def test_get_latest_backup_prefix_no_backups(self, mock_iter_keys):
         """Tests retrieving latest backup prefix with no backups."""
-        mock_list_objects.return_value = []
+        mock_iter_keys.return_value = iter([])
 
         result = s3.get_latest_backup_prefix(self.s3_bucket, self.s3_prefix, self.config)
         self.assertIsNone(result)
 
-    @patch('backupmate.s3.list_objects')
-    def test_get_latest_backup_prefix_error(self, mock_list_objects):
+    @patch('backupmate.s3._iter_keys')
+    def test_get_latest_backup_prefix_error(self, mock_iter_keys):
         """Tests error handling in get_latest_backup_prefix."""
-        mock_list_objects.side_effect = Exception("Test error")
+        mock_iter_keys.side_effect = Exception("Test error")
 
         result = s3.get_latest_backup_prefix(self.s3_bucket, self.s3_prefix, self.config)
         self.assertIsNone(result)
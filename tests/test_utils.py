@@ -4,13 +4,43 @@ import os
 from pathlib import Path
 import tarfile
 import shutil
+import sys
+import tempfile
+import io
+from backupmate import utils
 from backupmate.utils import compress_directory, decompress_archive, ensure_directory, clean_directory
 
+# Stand in for pigz/rapidgzip: write the decompressed archive (or stdin) to stdout
+_GZIP_DECODER = [sys.executable, '-c', 'import gzip, shutil, sys; shutil.copyfileobj(gzip.open(sys.argv[1]), sys.stdout.buffer)']
+_GZIP_STDIN_DECODER = [sys.executable, '-c', 'import gzip, shutil, sys; shutil.copyfileobj(gzip.open(sys.stdin.buffer), sys.stdout.buffer)']
+
+# Stand in for pigz: gzip stdin to stdout
+_GZIP_ENCODER = [sys.executable, '-c', 'import gzip, shutil, sys\nwith gzip.GzipFile(fileobj=sys.stdout.buffer, mode="wb") as f: shutil.copyfileobj(sys.stdin.buffer, f)']
+
+# setUp patches shutil.which, the round-trip test needs the real lookup
+_REAL_WHICH = shutil.which
+
 class TestUtils(unittest.TestCase):
     def setUp(self):
         self.test_dir = "test_dir"
         self.test_archive = "test_archive.tar.gz"
         self.output_dir = "output_dir"
+        # Keep the stdlib extraction path regardless of which decoders are installed
+        which_patcher = patch('backupmate.utils.shutil.which', return_value=None)
+        self.mock_which = which_patcher.start()
+        self.addCleanup(which_patcher.stop)
+
+    def _make_archive(self, members):
+        """Writes a real tar.gz with the given name -> bytes members into a temp dir."""
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        archive = os.path.join(tmp, 'full_backup.tar.gz')
+        with tarfile.open(archive, 'w:gz') as tar:
+            for name, data in members.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+        return archive, os.path.join(tmp, 'out')
 
     @patch('pathlib.Path.is_dir')
     @patch('tarfile.open')
@@ -25,6 +55,137 @@ class TestUtils(unittest.TestCase):
         self.assertTrue(result)
         mock_mkdir.assert_called_once()
         mock_tar.add.assert_called_once()
+        self.assertEqual(mock_tarfile.call_args.args[1], "w:gz")
+        self.assertEqual(mock_tarfile.call_args.kwargs['compresslevel'], 6)
+
+    @patch('pathlib.Path.is_dir')
+    @patch('backupmate.utils._compress_with_encoder')
+    @patch('pathlib.Path.mkdir')
+    def test_compress_directory_pigz(self, mock_mkdir, mock_compress, mock_is_dir):
+        mock_is_dir.return_value = True
+        self.mock_which.side_effect = lambda name: '/usr/bin/pigz' if name == 'pigz' else None
+
+        result = compress_directory(self.test_dir, self.test_archive)
+
+        self.assertTrue(result)
+        command, dir_path, output_path = mock_compress.call_args.args
+        self.assertEqual(command, ['/usr/bin/pigz', '-c', '-p', str(os.cpu_count() or 1)])
+        self.assertEqual((dir_path, output_path), (Path(self.test_dir), Path(self.test_archive)))
+
+    def test_compress_directory_encoder_round_trip(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        source = os.path.join(tmp, 'full_backup')
+        os.makedirs(os.path.join(source, 'db'))
+        with open(os.path.join(source, 'db', 't.ibd'), 'wb') as f:
+            f.write(b'table' * 1000)
+        archive = os.path.join(tmp, 'full_backup.tar.gz')
+
+        with patch('backupmate.utils._encoder_command', return_value=_GZIP_ENCODER):
+            self.assertTrue(compress_directory(source, archive))
+        result = decompress_archive(archive, os.path.join(tmp, 'out'))
+
+        with open(os.path.join(result, 'db', 't.ibd'), 'rb') as f:
+            self.assertEqual(f.read(), b'table' * 1000)
+
+    def test_compress_directory_encoder_failure(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        os.makedirs(os.path.join(tmp, 'full_backup'))
+        failing = [sys.executable, '-c', 'import sys; sys.stdin.buffer.read(); sys.exit(1)']
+
+        with patch('backupmate.utils._encoder_command', return_value=failing):
+            self.assertFalse(compress_directory(os.path.join(tmp, 'full_backup'), os.path.join(tmp, 'a.tar.gz')))
+
+    def test_compress_directory_to_stream(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        source = os.path.join(tmp, 'full_backup')
+        os.makedirs(os.path.join(source, 'db'))
+        with open(os.path.join(source, 'db', 't.ibd'), 'wb') as f:
+            f.write(os.urandom(256 * 1024))
+        with open(os.path.join(source, 'db', 't.ibd'), 'rb') as f:
+            expected = f.read()
+        
+        for encoder in (None, _GZIP_ENCODER):
+            with self.subTest(encoder=encoder):
+                uploaded = io.BytesIO()
+                with patch('backupmate.utils._encoder_command', return_value=encoder):
+                    result = utils.compress_directory_to_stream(
+                        source, 'full_backup.tar.gz', lambda stream: shutil.copyfileobj(stream, uploaded) or True)
+                self.assertTrue(result)
+                
+                uploaded.seek(0)
+                output = os.path.join(tmp, 'out')
+                shutil.rmtree(output, ignore_errors=True)
+                self.assertTrue(utils.extract_archive_stream(uploaded, output, 'full_backup.tar.gz'))
+                with open(os.path.join(output, 'full_backup', 'db', 't.ibd'), 'rb') as f:
+                    self.assertEqual(f.read(), expected)
+
+    def test_compress_directory_to_stream_consumer_failure(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        os.makedirs(os.path.join(tmp, 'full_backup'))
+        with open(os.path.join(tmp, 'full_backup', 'ibdata1'), 'wb') as f:
+            f.write(os.urandom(1024 * 1024))
+        
+        # Giving up without reading must not leave the writer blocked on a full pipe
+        result = utils.compress_directory_to_stream(
+            os.path.join(tmp, 'full_backup'), 'full_backup.tar.gz', lambda stream: False)
+        
+        self.assertFalse(result)
+        self.assertFalse(utils.compress_directory_to_stream(
+            os.path.join(tmp, 'missing'), 'missing.tar.gz', lambda stream: True))
+
+    def test_compress_directory_to_stream_writer_failure(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        source = os.path.join(tmp, 'full_b')
+        os.makedirs(source)
+        for name in ('a', 'b', 'c'):
+            with open(os.path.join(source, name), 'wb') as f:
+                f.write(os.urandom(1024))
+        
+        real_addfile = tarfile.TarFile.addfile
+        def addfile(tar, *args, **kwargs):
+            added.append(args[0].name)
+            if len(added) == 3:
+                raise OSError("Read error")
+            return real_addfile(tar, *args, **kwargs)
+        
+        # The consumer must never see a cleanly ended archive missing members
+        def consume(stream):
+            with self.assertRaises(OSError):
+                shutil.copyfileobj(stream, io.BytesIO())
+            return False
+        
+        for encoder in (None, _GZIP_ENCODER):
+            with self.subTest(encoder=encoder):
+                added = []
+                with patch('backupmate.utils._encoder_command', return_value=encoder), \
+                        patch.object(tarfile.TarFile, 'addfile', addfile):
+                    result = utils.compress_directory_to_stream(source, 'full_b.tar.gz', consume)
+                self.assertFalse(result)
+                self.assertEqual(len(added), 3)
+
+    def test_compress_directory_to_stream_encoder_failure(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        os.makedirs(os.path.join(tmp, 'full_backup'))
+        with open(os.path.join(tmp, 'full_backup', 'ibdata1'), 'wb') as f:
+            f.write(os.urandom(1024))
+        failing = [sys.executable, '-c', 'import sys; sys.stdin.buffer.read(); sys.stdout.write("x"); sys.exit(1)']
+        
+        def consume(stream):
+            with self.assertRaises(OSError):
+                shutil.copyfileobj(stream, io.BytesIO())
+            return False
+        
+        with patch('backupmate.utils._encoder_command', return_value=failing):
+            result = utils.compress_directory_to_stream(
+                os.path.join(tmp, 'full_backup'), 'full_backup.tar.gz', consume)
+        
+        self.assertFalse(result)
 
     @patch('pathlib.Path.is_dir')
     def test_compress_directory_missing_source(self, mock_is_dir):
@@ -50,9 +211,6 @@ class TestUtils(unittest.TestCase):
     def test_decompress_archive_success(self, mock_mkdir, mock_tarfile, mock_is_file):
         mock_is_file.return_value = True
         mock_tar = MagicMock()
-        mock_member = MagicMock()
-        mock_member.name = 'safe/path'
-        mock_tar.getmembers.return_value = [mock_member]
         mock_tarfile.return_value.__enter__.return_value = mock_tar
         
         result = decompress_archive(self.test_archive, self.output_dir)
@@ -60,6 +218,7 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(result, os.path.join(self.output_dir, 'test_archive'))
         mock_mkdir.assert_called_once()
         mock_tar.extractall.assert_called_once()
+        mock_tar.getmembers.assert_not_called()
 
     @patch('pathlib.Path.is_file')
     def test_decompress_archive_missing_archive(self, mock_is_file):
@@ -69,18 +228,110 @@ class TestUtils(unittest.TestCase):
         
         self.assertFalse(result)
 
-    @patch('pathlib.Path.is_file')
-    @patch('tarfile.open')
-    def test_decompress_archive_suspicious_path(self, mock_tarfile, mock_is_file):
-        mock_is_file.return_value = True
-        mock_tar = MagicMock()
-        mock_tar.getmembers.return_value = [MagicMock(name='/etc/passwd')]
-        mock_tarfile.return_value.__enter__.return_value = mock_tar
-        
-        result = decompress_archive(self.test_archive, self.output_dir)
-        
+    def test_decompress_archive_suspicious_path(self):
+        for name in ('../escaped', '/etc/escaped'):
+            with self.subTest(member=name):
+                archive, output = self._make_archive({name: b'data'})
+                
+                result = decompress_archive(archive, output)
+                
+                self.assertFalse(result)
+                self.assertFalse(os.path.exists(os.path.join(output, '..', 'escaped')))
+                self.assertFalse(os.path.exists(os.path.join(output, 'etc', 'escaped')))
+
+    def test_decoder_command(self):
+        cases = {
+            'rapidgzip': (['/usr/bin/rapidgzip', '/usr/bin/pigz'], '/usr/bin/rapidgzip', '-P'),
+            'pigz': ([None, '/usr/bin/pigz'], '/usr/bin/pigz', '-p'),
+        }
+        for name, (found, binary, threads_flag) in cases.items():
+            with self.subTest(decoder=name):
+                self.mock_which.side_effect = found
+                command = utils._decoder_command(Path('backup.tar.gz'))
+                self.assertEqual(command[:4], [binary, '-d', '-c', threads_flag])
+                self.assertEqual(command[-1], 'backup.tar.gz')
+        self.mock_which.side_effect = None
+        self.assertIsNone(utils._decoder_command(Path('backup.tar.gz')))
+
+    def test_decompress_archive_with_decoder(self):
+        archive, output = self._make_archive({'full_backup/ibdata1': b'data', 'full_backup/db/t.ibd': b'table'})
+        with patch('backupmate.utils._decoder_command', return_value=_GZIP_DECODER + [archive]):
+            result = decompress_archive(archive, output)
+        self.assertEqual(result, os.path.join(output, 'full_backup'))
+        with open(os.path.join(output, 'full_backup', 'db', 't.ibd'), 'rb') as f:
+            self.assertEqual(f.read(), b'table')
+
+    def test_decompress_archive_with_decoder_suspicious_path(self):
+        archive, output = self._make_archive({'../escaped': b'data'})
+        with patch('backupmate.utils._decoder_command', return_value=_GZIP_DECODER + [archive]):
+            result = decompress_archive(archive, output)
         self.assertFalse(result)
-        mock_tar.extractall.assert_not_called()
+        self.assertFalse(os.path.exists(os.path.join(output, '..', 'escaped')))
+
+    def test_extract_archive_stream(self):
+        archive, output = self._make_archive({'full_backup/ibdata1': b'data'})
+        for decoder in (None, _GZIP_STDIN_DECODER):
+            with self.subTest(decoder=decoder):
+                shutil.rmtree(output, ignore_errors=True)
+                with open(archive, 'rb') as stream, \
+                        patch('backupmate.utils._decoder_command', return_value=decoder):
+                    result = utils.extract_archive_stream(stream, output, 'full_backup.tar.gz')
+                self.assertEqual(result, os.path.join(output, 'full_backup'))
+                with open(os.path.join(output, 'full_backup', 'ibdata1'), 'rb') as f:
+                    self.assertEqual(f.read(), b'data')
+
+    def test_extract_archive_stream_truncated(self):
+        archive, output = self._make_archive({'full_backup/ibdata1': os.urandom(64 * 1024)})
+        with open(archive, 'rb') as f:
+            truncated = f.read()[:-1024]
+        for decoder in (None, _GZIP_STDIN_DECODER):
+            with self.subTest(decoder=decoder):
+                with patch('backupmate.utils._decoder_command', return_value=decoder):
+                    result = utils.extract_archive_stream(io.BytesIO(truncated), output, 'full_backup.tar.gz')
+                self.assertFalse(result)
+
+    @patch('backupmate.utils._extract_with_decoder')
+    def test_decompress_archive_zstd(self, mock_extract):
+        self.mock_which.side_effect = lambda name: '/usr/bin/zstd' if name == 'zstd' else None
+        output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output)
+        archive = os.path.join(output, 'full_20230101_120000.tar.zst')
+        open(archive, 'wb').close()
+
+        result = decompress_archive(archive, output)
+
+        self.assertEqual(result, os.path.join(output, 'full_20230101_120000'))
+        command = mock_extract.call_args.args[0]
+        self.assertEqual(command, ['/usr/bin/zstd', '-q', '--long=27', '-d', '-c', archive])
+
+    def test_zstd_archive_without_zstd(self):
+        output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output)
+        os.makedirs(os.path.join(output, 'full_backup'))
+        archive = os.path.join(output, 'full_backup.tar.zst')
+
+        self.assertFalse(compress_directory(os.path.join(output, 'full_backup'), archive))
+        open(archive, 'wb').close()
+        self.assertFalse(decompress_archive(archive, os.path.join(output, 'out')))
+        self.assertFalse(utils.extract_archive_stream(io.BytesIO(b''), output, 'full_backup.tar.zst'))
+
+    @unittest.skipUnless(shutil.which('zstd'), "zstd is not installed")
+    def test_zstd_archive_round_trip(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        source = os.path.join(tmp, 'full_backup')
+        os.makedirs(os.path.join(source, 'db'))
+        with open(os.path.join(source, 'db', 't.ibd'), 'wb') as f:
+            f.write(b'table' * 1000)
+        archive = os.path.join(tmp, 'full_backup.tar.zst')
+
+        with patch('backupmate.utils.shutil.which', new=_REAL_WHICH):
+            self.assertTrue(compress_directory(source, archive))
+            result = decompress_archive(archive, os.path.join(tmp, 'out'))
+
+        self.assertEqual(result, os.path.join(tmp, 'out', 'full_backup'))
+        with open(os.path.join(result, 'db', 't.ibd'), 'rb') as f:
+            self.assertEqual(f.read(), b'table' * 1000)
 
     @patch('pathlib.Path.mkdir')
     def test_ensure_directory_success(self, mock_mkdir):
@@ -97,28 +348,41 @@ class TestUtils(unittest.TestCase):
         
         self.assertFalse(result)
 
-    @patch('pathlib.Path.is_dir')
-    @patch('pathlib.Path.iterdir')
-    @patch('pathlib.Path.unlink')
-    @patch('shutil.rmtree')
-    def test_clean_directory_success(self, mock_rmtree, mock_unlink, mock_iterdir, mock_is_dir):
-        mock_is_dir.return_value = True
-        mock_file = MagicMock()
-        mock_file.is_file.return_value = True
-        mock_file.is_dir.return_value = False
-        mock_file.unlink = mock_unlink
+    def test_clean_directory_success(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        outside = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, outside)
+        os.makedirs(os.path.join(root, 'full_backup', 'db'))
+        for name in ('xtrabackup_info', os.path.join('full_backup', 'db', 't.ibd')):
+            with open(os.path.join(root, name), 'w'):
+                pass
+        # Links are removed, never followed
+        os.symlink(outside, os.path.join(root, 'dir_link'))
+        os.symlink(os.path.join(root, 'missing'), os.path.join(root, 'broken_link'))
         
-        mock_dir = MagicMock()
-        mock_dir.is_file.return_value = False
-        mock_dir.is_dir.return_value = True
+        result = clean_directory(root)
         
-        mock_iterdir.return_value = [mock_file, mock_dir]
+        self.assertTrue(result)
+        self.assertEqual(os.listdir(root), [])
+        self.assertTrue(os.path.isdir(outside))
+
+    def test_clean_directory_removes_subdirs_in_parallel(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        for name in ('full_1', 'full_2', 'inc_1'):
+            os.makedirs(os.path.join(root, name))
         
-        result = clean_directory(self.test_dir)
+        with patch('backupmate.utils.ThreadPoolExecutor', wraps=utils.ThreadPoolExecutor) as mock_executor:
+            result = clean_directory(root)
         
         self.assertTrue(result)
-        mock_unlink.assert_called_once()
-        mock_rmtree.assert_called_once()
+        self.assertEqual(os.listdir(root), [])
+        mock_executor.assert_called_once_with(max_workers=utils._REMOVE_WORKERS)
+        
+        os.makedirs(os.path.join(root, 'full_1'))
+        with patch('backupmate.utils.shutil.rmtree', side_effect=PermissionError()):
+            self.assertFalse(clean_directory(root))
 
     @patch('pathlib.Path.is_dir')
     def test_clean_directory_missing_directory(self, mock_is_dir):
@@ -129,10 +393,10 @@ class TestUtils(unittest.TestCase):
         self.assertFalse(result)
 
     @patch('pathlib.Path.is_dir')
-    @patch('pathlib.Path.iterdir')
-    def test_clean_directory_permission_error(self, mock_iterdir, mock_is_dir):
+    @patch('backupmate.utils.os.scandir')
+    def test_clean_directory_permission_error(self, mock_scandir, mock_is_dir):
         mock_is_dir.return_value = True
-        mock_iterdir.side_effect = PermissionError()
+        mock_scandir.side_effect = PermissionError()
         
         result = clean_directory(self.test_dir)
         